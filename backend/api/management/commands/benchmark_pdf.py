@@ -0,0 +1,58 @@
+from time import perf_counter
+
+from django.core.management.base import BaseCommand
+
+from api.v1.pdf_generate import ShoppingListPDFBuilder, renderer
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнение времени генерации PDF со списком покупок: с подготовкой '
+        'шрифтов и стилей на каждый запрос и с общим рендерером процесса.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rows', type=int, default=50,
+            help='Количество ингредиентов в списке.'
+        )
+        parser.add_argument(
+            '--repeat', type=int, default=20,
+            help='Количество генераций для каждого варианта.'
+        )
+
+    def handle(self, **options):
+        ingredients = [
+            {
+                'name': f'Ингредиент {number}',
+                'amount': number,
+                'measurement_unit': 'г',
+            }
+            for number in range(options['rows'])
+        ]
+        cold = self.measure(
+            lambda: ShoppingListPDFBuilder().render(ingredients),
+            options['repeat'],
+        )
+        warm = self.measure(
+            lambda: renderer.render(ingredients),
+            options['repeat'],
+        )
+        self.stdout.write(
+            f'Строк: {options["rows"]}, повторов: {options["repeat"]}'
+        )
+        self.stdout.write(f'Инициализация на каждый запрос: {cold:.2f} мс')
+        self.stdout.write(f'Общий рендерер процесса: {warm:.2f} мс')
+        self.stdout.write(self.style.SUCCESS(
+            f'Ускорение: {cold / warm:.1f}x'
+        ))
+
+    @staticmethod
+    def measure(render, repeat):
+        timings = []
+        for _ in range(repeat):
+            started = perf_counter()
+            render().close()
+            timings.append(perf_counter() - started)
+        timings.sort()
+        return timings[len(timings) // 2] * 1000
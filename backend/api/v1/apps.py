@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class ApiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'api'
+
+    def ready(self):
+        # Шрифты и стили PDF загружаются один раз при старте процесса.
+        from . import pdf_generate  # noqa: F401
+        from . import signals  # noqa: F401
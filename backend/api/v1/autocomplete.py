@@ -0,0 +1,138 @@
+"""Индекс автодополнения ингредиентов в памяти процесса.
+
+Нормализованные имена ингредиентов хранятся отсортированным массивом,
+поэтому совпадения по префиксу находятся бинарным поиском. Если
+совпадений мало, запрос дополняется вариантами с одной опечаткой
+(замена, пропуск, лишний символ или перестановка соседних), и каждый
+вариант тоже ищется бинарным поиском: время ответа не зависит от размера
+справочника. Совпадения по префиксу идут первыми, за ними — варианты с
+опечаткой, от более вероятных правок к менее вероятным. Внутри группы
+выше ингредиенты, которые чаще встречаются в рецептах.
+
+Индекс строится при старте процесса (см. foodgram.wsgi), а не на
+первом запросе, и периодически перестраивается (см. process_cache):
+так учитывается и новая популярность ингредиентов.
+"""
+import logging
+from bisect import bisect_left
+
+from django.db import DatabaseError
+from django.db.models import Count
+from recipes.models import Ingredient, IngredientInRecipe
+
+from .process_cache import ProcessCache
+
+# Поиск с опечатками включается для запросов не короче FUZZY_MIN_LENGTH
+# символов, если точных совпадений по префиксу меньше FUZZY_LIMIT.
+FUZZY_MIN_LENGTH = 3
+FUZZY_LIMIT = 10
+
+LAST_CHAR = chr(0x10FFFF)
+
+# Цена правки: перестановка соседних букв — самая частая опечатка,
+# пропущенная или заменённая буква — обычные, а лишняя буква в запросе
+# укорачивает его и даёт больше всего случайных совпадений.
+TRANSPOSE, INSERT, REPLACE, DELETE = 0, 1, 1, 2
+
+logger = logging.getLogger(__name__)
+
+
+def normalize(name):
+    return ' '.join(name.lower().replace('ё', 'е').split())
+
+
+def one_edit_variants(query, alphabet):
+    """Строки, отличающиеся от query одной правкой, с её ценой."""
+    variants = {}
+
+    def add(variant, cost):
+        if cost < variants.get(variant, DELETE + 1):
+            variants[variant] = cost
+
+    for index in range(len(query) + 1):
+        head, tail = query[:index], query[index:]
+        if tail:
+            add(head + tail[1:], DELETE)
+            if len(tail) > 1:
+                add(head + tail[1] + tail[0] + tail[2:], TRANSPOSE)
+        for char in alphabet:
+            add(head + char + tail, INSERT)
+            if tail:
+                add(head + char + tail[1:], REPLACE)
+    variants.pop(query, None)
+    return variants
+
+
+class IngredientIndex(ProcessCache):
+
+    def __init__(self):
+        super().__init__()
+        self.index = ([], [], '')
+
+    def build(self):
+        usage = dict(
+            IngredientInRecipe.objects.order_by().values(
+                'ingredient'
+            ).annotate(
+                count=Count('id')
+            ).values_list('ingredient', 'count')
+        )
+        entries = sorted(
+            (
+                normalize(ingredient['name']),
+                -usage.get(ingredient['id'], 0),
+                ingredient['name'],
+                ingredient,
+            )
+            for ingredient in Ingredient.objects.values(
+                'id', 'name', 'measurement_unit'
+            ).order_by()
+        )
+        keys = [entry[0] for entry in entries]
+        ranked = [entry[1:] for entry in entries]
+        alphabet = ''.join(sorted(set(''.join(keys))))
+        self.index = (keys, ranked, alphabet)
+
+    def warm_up(self):
+        """Строит индекс заранее, чтобы первый запрос не ждал сборки."""
+        try:
+            self.ensure_built()
+        except DatabaseError:
+            # База ещё не готова (например, до миграций): индекс
+            # соберётся на первом запросе.
+            logger.warning('Индекс ингредиентов не построен при старте.')
+
+    @staticmethod
+    def prefix_range(keys, prefix):
+        return (
+            bisect_left(keys, prefix),
+            bisect_left(keys, prefix + LAST_CHAR),
+        )
+
+    def search(self, query):
+        """Возвращает словари ингредиентов, подходящих под запрос."""
+        self.ensure_built()
+        keys, ranked, alphabet = self.index
+        query = normalize(query)
+        start, end = self.prefix_range(keys, query)
+        matches = sorted(ranked[start:end])
+        if len(matches) >= FUZZY_LIMIT or len(query) < FUZZY_MIN_LENGTH:
+            return [entry[-1] for entry in matches]
+        typos = {}
+        for variant, cost in one_edit_variants(query, alphabet).items():
+            if len(variant) < FUZZY_MIN_LENGTH:
+                continue
+            first, last = self.prefix_range(keys, variant)
+            for position in range(first, last):
+                if start <= position < end:
+                    continue
+                # Ключ, целиком совпавший с вариантом, ближе к запросу,
+                # чем тот, для которого вариант лишь префикс.
+                rank = (cost + (keys[position] != variant),)
+                rank += ranked[position]
+                typos[position] = min(typos.get(position, rank), rank)
+        best = sorted(typos.values())[:FUZZY_LIMIT]
+        return [entry[-1] for entry in matches + best]
+
+
+ingredient_index = IngredientIndex()
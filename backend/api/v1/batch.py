@@ -0,0 +1,99 @@
+"""Пакетное добавление и удаление избранного, покупок и подписок.
+
+Все id пакета проверяются одним запросом, изменения применяются одним
+INSERT или DELETE, а остальное делают приёмники сигнала
+recipes.links.links_changed. Успех и сигнал относятся только к связям,
+которые вернул RETURNING: связь, которую между проверкой и записью
+изменил параллельный запрос, получает ту же ошибку, что и при
+проверке.
+"""
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+from recipes import links
+from recipes.models import FavoriteRecipe, ShoppingCart, Subscribe
+from rest_framework import status
+
+# Связь -> сообщения об уже существующей и об отсутствующей связи.
+MESSAGES = {
+    FavoriteRecipe: ('Рецепт уже в избранном.', 'Рецепта нет в избранном.'),
+    ShoppingCart: (
+        'Рецепт уже в списке покупок.', 'Рецепта нет в списке покупок.',
+    ),
+    Subscribe: (
+        'Вы уже подписаны на этого пользователя.',
+        'Вы не подписаны на этого пользователя.',
+    ),
+}
+
+NOT_FOUND = 'Объект не найден.'
+SELF_SUBSCRIBE = 'Нельзя подписаться на самого себя.'
+
+
+def result(pk, code, error=None):
+    if error is None:
+        return {'id': pk, 'status': code}
+    return {'id': pk, 'status': code, 'error': error}
+
+
+def check(model, user, ids, adding):
+    """Разбирает пакет: возвращает id для изменения и ошибки по остальным."""
+    user_field, field = links.FIELDS[model]
+    target = model._meta.get_field(field).related_model
+    exists, missing = MESSAGES[model]
+    linked = dict(target.objects.filter(pk__in=ids).annotate(
+        linked=Exists(model.objects.filter(
+            **{user_field: user, field: OuterRef('pk')}
+        ))
+    ).values_list('pk', 'linked'))
+    candidates, errors = [], {}
+    for pk in dict.fromkeys(ids):
+        if pk not in linked:
+            errors[pk] = result(pk, status.HTTP_404_NOT_FOUND, NOT_FOUND)
+        elif adding and model is Subscribe and pk == user.pk:
+            errors[pk] = result(
+                pk, status.HTTP_400_BAD_REQUEST, SELF_SUBSCRIBE
+            )
+        elif linked[pk] == adding:
+            errors[pk] = result(
+                pk, status.HTTP_400_BAD_REQUEST, exists if adding else missing
+            )
+        else:
+            candidates.append(pk)
+    return candidates, errors
+
+
+def apply(model, user, ids, adding):
+    candidates, errors = check(model, user, ids, adding)
+    changed = []
+    if candidates:
+        write = links.insert if adding else links.delete
+        changed = write(model, user.pk, candidates)
+    if changed:
+        links.changed(model, user.pk, changed, created=adding)
+    exists, missing = MESSAGES[model]
+    done = set(changed)
+    results = []
+    for pk in dict.fromkeys(ids):
+        if pk in errors:
+            results.append(errors[pk])
+        elif pk in done:
+            results.append(result(
+                pk,
+                status.HTTP_201_CREATED if adding
+                else status.HTTP_204_NO_CONTENT
+            ))
+        else:
+            results.append(result(
+                pk, status.HTTP_400_BAD_REQUEST, exists if adding else missing
+            ))
+    return results
+
+
+@transaction.atomic
+def add(model, user, ids):
+    return apply(model, user, ids, adding=True)
+
+
+@transaction.atomic
+def remove(model, user, ids):
+    return apply(model, user, ids, adding=False)
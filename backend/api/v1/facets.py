@@ -0,0 +1,93 @@
+"""Счётчики фасетов для списка рецептов (``?facets=1``).
+
+Для текущих фильтров считается, сколько рецептов есть с каждым тегом и
+сколько из них в избранном и в списке покупок пользователя. Всё
+считается одним агрегирующим запросом по отфильтрованному списку:
+условный COUNT на каждый тег (через EXISTS, чтобы рецепт с несколькими
+тегами не считался дважды) и на каждый флаг.
+
+Результат кешируется по набору фильтров. В ключ входят версия списка
+рецептов (см. response_cache) и версия избранного и корзины
+пользователя, которую меняет любая запись в них.
+"""
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Exists, OuterRef, Q
+from recipes.models import Recipe
+
+from . import response_cache
+from .tag_slugs import tag_slugs
+
+# Параметры, которые не влияют на состав отфильтрованного списка.
+IGNORED_PARAMS = {'limit', 'page', 'cursor', 'facets', 'format'}
+
+
+def requested(request):
+    return request.query_params.get('facets') in ('1', 'true')
+
+
+def user_version_key(user_id):
+    return f'recipes:facets:user:{user_id}'
+
+
+def user_version(user):
+    if user.is_anonymous:
+        return 'anonymous'
+    return response_cache.version(user_version_key(user.pk))
+
+
+def bump_user_version(user_id):
+    response_cache.bump_version(user_version_key(user_id))
+
+
+def cache_key(request):
+    query = response_cache.normalized_query(
+        request.query_params, IGNORED_PARAMS
+    )
+    digest = hashlib.md5(query.encode()).hexdigest()
+    return (
+        f'recipes:facets:{response_cache.version()}:'
+        f'{user_version(request.user)}:{digest}'
+    )
+
+
+def compute(queryset):
+    """Счётчики по отфильтрованному queryset из views.recipes_for."""
+    tags = tag_slugs.slugs()
+    # Признаки тегов считаются аннотациями внутреннего запроса:
+    # OuterRef внутри фильтра агрегата ссылался бы на внешний SELECT.
+    counts = queryset.order_by().annotate(**{
+        f'has_tag_{tag_id}': Exists(Recipe.tags.through.objects.filter(
+            recipe=OuterRef('pk'), tag_id=tag_id
+        ))
+        for tag_id in tags.values()
+    }).aggregate(
+        total=Count('pk'),
+        is_favorited=Count('pk', filter=Q(favorited=True)),
+        is_in_shopping_cart=Count('pk', filter=Q(in_shopping_cart=True)),
+        **{
+            f'tag_{tag_id}': Count(
+                'pk', filter=Q(**{f'has_tag_{tag_id}': True})
+            )
+            for tag_id in tags.values()
+        }
+    )
+    return {
+        'total': counts['total'],
+        'tags': {
+            slug: counts[f'tag_{tag_id}'] for slug, tag_id in tags.items()
+        },
+        'is_favorited': counts['is_favorited'],
+        'is_in_shopping_cart': counts['is_in_shopping_cart'],
+    }
+
+
+def facets(request, queryset):
+    key = cache_key(request)
+    result = cache.get(key)
+    if result is None:
+        result = compute(queryset)
+        cache.set(key, result, settings.RECIPE_FACETS_CACHE_TIMEOUT)
+    return result
@@ -1,9 +1,16 @@
-from django_filters.rest_framework import (BooleanFilter, CharFilter,
-                                           FilterSet,
-                                           ModelMultipleChoiceFilter)
-from recipes.models import Recipe, Tag
+from django.contrib.postgres.search import (SearchQuery, SearchRank,
+                                            TrigramSimilarity)
+from django.db import connection
+from django.db.models import (Case, Exists, F, IntegerField, OuterRef, Q,
+                              Value, When)
+from django.forms import SelectMultiple
+from django_filters.rest_framework import (BooleanFilter, CharFilter, Filter,
+                                           FilterSet)
+from recipes.models import Recipe
 from rest_framework.filters import SearchFilter
 
+from .tag_slugs import tag_slugs
+
 
 class IngredientFilter(SearchFilter):
     search_param = 'name'
@@ -11,13 +18,30 @@ class IngredientFilter(SearchFilter):
 
 class RecipeFilter(FilterSet):
     author = CharFilter(field_name='author__id',)
-    tags = ModelMultipleChoiceFilter(
-        field_name='tags__slug',
-        to_field_name='slug',
-        queryset=Tag.objects.all()
-    )
+    # Несколько slug повторяющимся параметром (?tags=a&tags=b). Список
+    # тегов в каждом процессе свой, поэтому slug с ним не сверяются и
+    # неизвестный slug не даёт 400, а просто ничему не соответствует:
+    # ?tags=missing возвращает пустой список. Пустое значение (?tags=)
+    # не фильтрует, как и отсутствующий параметр.
+    tags = Filter(method='tags_filter', widget=SelectMultiple)
     is_favorited = BooleanFilter(method='favorited_filter')
     is_in_shopping_cart = BooleanFilter(method='shopping_cart_filter')
+    search = CharFilter(method='search_filter')
+
+    def tags_filter(self, queryset, name, value):
+        """Рецепты хотя бы с одним из тегов, без дублей.
+
+        Полусоединение EXISTS по таблице рецепт-тег не размножает строки
+        при нескольких совпавших тегах, а id тегов берутся из tag_slugs.
+        """
+        slugs = [slug for slug in value if slug]
+        if not slugs:
+            return queryset
+        return queryset.filter(Exists(
+            Recipe.tags.through.objects.filter(
+                recipe=OuterRef('pk'), tag_id__in=tag_slugs.resolve(slugs)
+            )
+        ))
 
     def favorited_filter(self, queryset, name, value):
         user = self.request.user
@@ -31,6 +55,35 @@ class RecipeFilter(FilterSet):
             return queryset.filter(is_in_shopping_cart__author=user)
         return queryset
 
+    def search_filter(self, queryset, name, value):
+        """Поиск по названию и описанию, упорядоченный по релевантности.
+
+        В PostgreSQL используется сохранённый поисковый вектор с русской
+        конфигурацией и триграммный индекс по названию, что находит
+        рецепты и при опечатках. На других СУБД поиск сводится к
+        icontains, а рецепты с совпадением в названии идут первыми.
+        """
+        value = value.strip()
+        if not value:
+            return queryset
+        if connection.vendor == 'postgresql':
+            query = SearchQuery(value, config='russian')
+            return queryset.filter(
+                Q(search_vector=query) | Q(name__trigram_similar=value)
+            ).annotate(
+                rank=SearchRank(F('search_vector'), query)
+                + TrigramSimilarity('name', value)
+            ).order_by('-rank', '-pub_date')
+        return queryset.filter(
+            Q(name__icontains=value) | Q(text__icontains=value)
+        ).annotate(
+            rank=Case(
+                When(name__icontains=value, then=Value(1)),
+                default=Value(0),
+                output_field=IntegerField(),
+            )
+        ).order_by('-rank', '-pub_date')
+
     class Meta:
         model = Recipe
-        fields = ('tags', 'author', 'is_favorited')
+        fields = ('tags', 'author', 'is_favorited', 'search')
@@ -0,0 +1,85 @@
+"""Кеш общей части представления рецептов.
+
+Для разных пользователей RecipeReadSerializer отличается только флагами
+is_favorited, is_in_shopping_cart и author.is_subscribed. Поэтому теги,
+ингредиенты, автор и тексты рецепта сериализуются один раз и хранятся в
+кеше по id и версии рецепта (см. Recipe.touched).
+Флаги, картинки и счётчики накладываются поверх из строк текущей
+страницы: аннотации считаются в том же запросе, что и сама страница.
+Предзагрузка тегов, ингредиентов и авторов нужна только для промахов.
+"""
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Prefetch, prefetch_related_objects
+from recipes.models import IngredientInRecipe
+
+from .serializers import (RecipePersonalSerializer, RecipeReadSerializer,
+                          RecipeSharedSerializer)
+
+SHARED_PREFETCHES = (
+    'tags',
+    Prefetch(
+        'recipe',
+        queryset=IngredientInRecipe.objects.select_related('ingredient'),
+    ),
+    'author',
+)
+
+
+def fragment_key(recipe):
+    return f'recipes:fragment:{recipe.pk}:{recipe.version}'
+
+
+def etag(recipe):
+    """ETag представления рецепта для текущего пользователя.
+
+    Кроме версии рецепта учитывает всё, что накладывается поверх
+    фрагмента, поэтому считается без сериализации.
+    """
+    state = (
+        recipe.pk, recipe.version, recipe.favorites_count,
+        recipe.favorited, recipe.in_shopping_cart, recipe.author_subscribed,
+    )
+    return '"%s"' % hashlib.md5(repr(state).encode()).hexdigest()
+
+
+def shared_fragments(recipes, request):
+    keys = {recipe.pk: fragment_key(recipe) for recipe in recipes}
+    cached = cache.get_many(keys.values())
+    misses = [recipe for recipe in recipes if keys[recipe.pk] not in cached]
+    if misses:
+        prefetch_related_objects(misses, *SHARED_PREFETCHES)
+        fresh = {
+            keys[recipe.pk]: data
+            for recipe, data in zip(misses, RecipeSharedSerializer(
+                misses, many=True, context={'request': request}
+            ).data)
+        }
+        cache.set_many(fresh, settings.RECIPE_FRAGMENT_CACHE_TIMEOUT)
+        cached.update(fresh)
+    return [cached[keys[recipe.pk]] for recipe in recipes]
+
+
+def serialize_recipes(recipes, request):
+    """Представления рецептов из кеша с наложенными личными полями.
+
+    Рецепты должны быть получены через views.recipes_for, чтобы у них
+    были аннотации favorited, in_shopping_cart и author_subscribed.
+    """
+    personal = RecipePersonalSerializer(
+        recipes, many=True, context={'request': request}
+    ).data
+    result = []
+    for recipe, shared, overlay in zip(
+        recipes, shared_fragments(recipes, request), personal
+    ):
+        data = {**shared, **overlay}
+        data['author'] = {
+            **shared['author'], 'is_subscribed': recipe.author_subscribed,
+        }
+        result.append({
+            name: data[name] for name in RecipeReadSerializer.Meta.fields
+        })
+    return result
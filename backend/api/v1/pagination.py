@@ -1,5 +1,102 @@
+import base64
+import binascii
+import json
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
 from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
 
 
 class LimitPagination(PageNumberPagination):
     page_size_query_param = 'limit'
+
+
+class CursorLimitPagination(LimitPagination):
+    """Постраничный вывод с необязательным режимом курсора.
+
+    Без параметра ``cursor`` работает как LimitPagination. С ним лента
+    отдаётся по ключу (pub_date, id) в порядке убывания: следующая
+    страница начинается сразу после последней записи предыдущей, так что
+    запрос не считает COUNT(*) и не пропускает строки через OFFSET.
+    Первая страница запрашивается пустым ``?cursor=``, ссылка на
+    следующую приходит в поле ``next``. Порядок в режиме курсора всегда
+    хронологический, даже если фильтр задал другой.
+    """
+
+    cursor_query_param = 'cursor'
+    cursor_page_size = 10
+    cursor_only = False
+    invalid_cursor_message = 'Неверный курсор.'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.cursor_mode = (
+            self.cursor_only
+            or self.cursor_query_param in request.query_params
+        )
+        if not self.cursor_mode:
+            return super().paginate_queryset(queryset, request, view)
+        self.request = request
+        size = self.get_page_size(request) or self.cursor_page_size
+        queryset = queryset.order_by('-pub_date', '-id')
+        position = self.decode_cursor(request)
+        if position is not None:
+            pub_date, pk = position
+            # Условие pub_date <= ... дублирует ключ, чтобы СУБД
+            # читала составной индекс диапазоном, а не объединением.
+            queryset = queryset.filter(
+                Q(pub_date__lt=pub_date) | Q(pub_date=pub_date, id__lt=pk),
+                pub_date__lte=pub_date,
+            )
+        page = list(queryset[:size + 1])
+        self.next_position = None
+        if len(page) > size:
+            page = page[:size]
+            self.next_position = (page[-1].pub_date, page[-1].id)
+        return page
+
+    def decode_cursor(self, request):
+        cursor = request.query_params.get(self.cursor_query_param)
+        if not cursor:
+            return None
+        try:
+            pub_date, pk = json.loads(base64.urlsafe_b64decode(cursor))
+            pub_date = parse_datetime(pub_date)
+            pk = int(pk)
+        except (TypeError, ValueError, binascii.Error):
+            raise NotFound(self.invalid_cursor_message)
+        if pub_date is None:
+            raise NotFound(self.invalid_cursor_message)
+        return pub_date, pk
+
+    def encode_cursor(self, position):
+        pub_date, pk = position
+        cursor = json.dumps([pub_date.isoformat(), pk]).encode()
+        return base64.urlsafe_b64encode(cursor).decode()
+
+    def get_next_link(self):
+        if not self.cursor_mode:
+            return super().get_next_link()
+        if self.next_position is None:
+            return None
+        return replace_query_param(
+            self.request.build_absolute_uri(),
+            self.cursor_query_param,
+            self.encode_cursor(self.next_position),
+        )
+
+    def get_paginated_response(self, data):
+        if not self.cursor_mode:
+            return super().get_paginated_response(data)
+        return Response({
+            'next': self.get_next_link(),
+            'results': data,
+        })
+
+
+class FeedPagination(CursorLimitPagination):
+    """Лента подписок отдаётся только в режиме курсора."""
+
+    cursor_only = True
@@ -0,0 +1,80 @@
+"""Готовые JSON-ответы для справочников тегов и ингредиентов.
+
+Справочники меняются редко, поэтому сериализуются один раз на процесс
+и отдаются готовыми байтами (см. process_cache). Каждый ответ несёт
+``ETag`` и ``Last-Modified``, так что браузер и nginx получают 304
+вместо повторной передачи.
+"""
+import hashlib
+import time
+from collections import namedtuple
+
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+from recipes.models import Ingredient, Tag
+from rest_framework.renderers import JSONRenderer
+
+from .process_cache import ProcessCache
+from .serializers import IngredientSerializer, TagSerializer
+
+Payload = namedtuple('Payload', 'content etag last_modified')
+
+
+class PayloadCache(ProcessCache):
+
+    def __init__(self, queryset, serializer_class):
+        super().__init__()
+        self.queryset = queryset
+        self.serializer_class = serializer_class
+        self.payloads = {}
+
+    def payload(self, content, previous):
+        """Собирает ответ, сохраняя Last-Modified неизменившихся данных."""
+        etag = '"{}"'.format(hashlib.sha256(content).hexdigest())
+        if previous is not None and previous.etag == etag:
+            return previous
+        return Payload(content, etag, int(time.time()))
+
+    def build(self):
+        renderer = JSONRenderer()
+        items = {
+            item['id']: renderer.render(item)
+            for item in self.serializer_class(
+                self.queryset.all(), many=True
+            ).data
+        }
+        content = b'[' + b','.join(items.values()) + b']'
+        previous = self.payloads
+        payloads = {
+            pk: self.payload(item, previous.get(pk))
+            for pk, item in items.items()
+        }
+        payloads[None] = self.payload(content, previous.get(None))
+        self.payloads = payloads
+
+    def get(self, pk=None):
+        """Возвращает список целиком или объект по pk, если он есть."""
+        self.ensure_built()
+        return self.payloads.get(pk)
+
+    @staticmethod
+    def response(request, payload):
+        response = get_conditional_response(
+            request, etag=payload.etag, last_modified=payload.last_modified
+        )
+        if response is None:
+            response = HttpResponse(
+                payload.content, content_type='application/json'
+            )
+        response['ETag'] = payload.etag
+        response['Last-Modified'] = http_date(payload.last_modified)
+        # Клиент хранит ответ, но перепроверяет его на каждом запросе.
+        patch_cache_control(response, no_cache=True)
+        return response
+
+
+tag_payloads = PayloadCache(Tag.objects.all(), TagSerializer)
+ingredient_payloads = PayloadCache(
+    Ingredient.objects.all(), IngredientSerializer
+)
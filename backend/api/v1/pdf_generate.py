@@ -1,4 +1,7 @@
-import reportlab
+import os
+from tempfile import SpooledTemporaryFile
+from xml.sax.saxutils import escape
+
 from foodgram.settings import MEDIA_ROOT
 from reportlab.lib import colors
 from reportlab.lib.enums import TA_CENTER, TA_LEFT
@@ -9,48 +12,89 @@ from reportlab.pdfbase import pdfmetrics
 from reportlab.pdfbase.ttfonts import TTFont
 from reportlab.platypus import Paragraph, SimpleDocTemplate, Spacer
 
+FONT_PATH = os.path.join(MEDIA_ROOT, 'fonts', 'opensans.ttf')
+
+# Пока PDF меньше этого размера, он собирается в памяти,
+# более крупные документы сбрасываются во временный файл на диске.
+SPOOL_MAX_SIZE = 1024 * 1024
+
+
+class ShoppingListPDFBuilder:
+    """Сборщик PDF списка покупок.
+
+    Шрифт, стили и параметры страницы готовятся один раз в конструкторе,
+    render() только верстает документ из уже подготовленного состояния.
+    """
+
+    title = 'Ингредиенты:'
+
+    def __init__(self, font_path=FONT_PATH):
+        pdfmetrics.registerFont(TTFont('OpenSans', font_path))
+        self.styles = self.build_styles()
+        self.page = {
+            'title': 'Список ингредиентов',
+            'pagesize': A4,
+            'rightMargin': 2 * cm,
+            'leftMargin': 2 * cm,
+            'topMargin': 2 * cm,
+            'bottomMargin': 2 * cm,
+        }
+
+    @staticmethod
+    def build_styles():
+        styles = getSampleStyleSheet()
+        styles.add(ParagraphStyle(
+            name='Top Recipe',
+            fontName='OpenSans',
+            fontSize=15,
+            leading=20,
+            backColor=colors.orange,
+            textColor=colors.white,
+            alignment=TA_CENTER)
+        )
+        styles.add(ParagraphStyle(
+            name='Ingredient',
+            fontName='OpenSans',
+            fontSize=10,
+            textColor=colors.black,
+            alignment=TA_LEFT)
+        )
+        styles.add(ParagraphStyle(
+            name='Info',
+            fontName='OpenSans',
+            fontSize=9,
+            textColor=colors.silver,
+            alignment=TA_LEFT)
+        )
+        return styles
+
+    def render(self, ingredients):
+        """Собирает PDF со списком покупок и возвращает открытый файл.
+
+        ingredients — итерируемый набор словарей с ключами ``name``,
+        ``amount`` и ``measurement_unit``; каждая строка становится
+        отдельным абзацем, поэтому reportlab разбивает список по страницам,
+        а не верстает его одним блоком.
+        """
+        file = SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE)
+        pdf = SimpleDocTemplate(file, **self.page)
+        pdf_generate = []
+        pdf_generate.append(Paragraph(self.title, self.styles['Top Recipe']))
+        pdf_generate.append(Spacer(1, 24))
+        pdf_generate.extend(
+            Paragraph(
+                escape('{name} - {amount} {measurement_unit}'.format(**row)),
+                self.styles['Ingredient']
+            )
+            for row in ingredients
+        )
+        pdf.build(pdf_generate)
+        file.seek(0)
+        return file
+
+
+renderer = ShoppingListPDFBuilder()
+
 
-def pdf_generate(text, response):
-    reportlab.rl_config.TTFSearchPath.append(str(MEDIA_ROOT) + '/fonts')
-    pdfmetrics.registerFont(TTFont('OpenSans', 'opensans.ttf'))
-    styles = getSampleStyleSheet()
-    styles.add(ParagraphStyle(
-        name='Top Recipe',
-        fontName='OpenSans',
-        fontSize=15,
-        leading=20,
-        backColor=colors.orange,
-        textColor=colors.white,
-        alignment=TA_CENTER)
-    )
-    styles.add(ParagraphStyle(
-        name='Ingredient',
-        fontName='OpenSans',
-        fontSize=10,
-        textColor=colors.black,
-        alignment=TA_LEFT)
-    )
-    styles.add(ParagraphStyle(
-        name='Info',
-        fontName='OpenSans',
-        fontSize=9,
-        textColor=colors.silver,
-        alignment=TA_LEFT)
-    )
-
-    pdf = SimpleDocTemplate(
-        response,
-        title='Список ингредиентов',
-        pagesize=A4,
-        rightMargin=2 * cm,
-        leftMargin=2 * cm,
-        topMargin=2 * cm,
-        bottomMargin=2 * cm
-    )
-    pdf_generate = []
-    text_title = 'Ингредиенты:'
-    pdf_generate.append(Paragraph(text_title, styles['Top Recipe']))
-    pdf_generate.append(Spacer(1, 24))
-    pdf_generate.append(Paragraph(text, styles['Ingredient']))
-    pdf.build(pdf_generate)
-    return response
+def pdf_generate(ingredients):
+    return renderer.render(ingredients)
@@ -0,0 +1,159 @@
+"""Фоновая генерация PDF со списком покупок.
+
+PDF рендерится в локальном пуле процессов, без внешнего брокера.
+Состояние задачи хранится файлами в каталоге пользователя, поэтому его
+видят все воркеры gunicorn на одной машине:
+
+* ``<id>.pending`` — задача поставлена в очередь;
+* ``<id>.pdf`` — документ готов;
+* ``<id>.error`` — рендеринг завершился ошибкой.
+
+Идентификатор задачи — хеш содержимого корзины, так что повторный запрос
+при неизменной корзине возвращает уже готовый или ещё рендерящийся файл.
+Файлы прежних задач удаляются при постановке новой, кроме тех, что ещё
+рендерятся.
+"""
+import hashlib
+import json
+import os
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from django.conf import settings
+
+from .pdf_generate import pdf_generate
+
+PENDING = 'pending'
+READY = 'ready'
+FAILED = 'failed'
+
+# Через сколько секунд незавершённая задача считается потерянной
+# (например, воркер был перезапущен) и ставится в очередь заново.
+PENDING_TIMEOUT = 5 * 60
+
+_executor = None
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(
+            max_workers=settings.SHOPPING_CART_PDF_WORKERS
+        )
+    return _executor
+
+
+def reset_executor(broken):
+    """Сбрасывает пул, сломанный гибелью процесса-рендерера.
+
+    Новый пул создаст следующий get_executor(). Если пул уже заменён
+    другим потоком, ничего не делает.
+    """
+    global _executor
+    if _executor is broken:
+        _executor = None
+        broken.shutdown(wait=False)
+
+
+def user_dir(user):
+    return os.path.join(settings.SHOPPING_CART_PDF_ROOT, str(user.pk))
+
+
+def job_path(user, job_id, extension):
+    return os.path.join(user_dir(user), f'{job_id}.{extension}')
+
+
+def job_id(user, ingredients):
+    payload = json.dumps([user.pk, ingredients], sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def job_status(user, job_id):
+    """Возвращает статус задачи или None, если задача неизвестна."""
+    if os.path.exists(job_path(user, job_id, 'pdf')):
+        return READY
+    if os.path.exists(job_path(user, job_id, 'error')):
+        return FAILED
+    try:
+        started = os.path.getmtime(job_path(user, job_id, 'pending'))
+    except FileNotFoundError:
+        return None
+    if time.time() - started > PENDING_TIMEOUT:
+        return None
+    return PENDING
+
+
+def submit(user, ingredients):
+    """Ставит рендеринг в очередь и возвращает (id задачи, статус)."""
+    ingredients = list(ingredients)
+    current = job_id(user, ingredients)
+    status = job_status(user, current)
+    if status in (READY, PENDING):
+        return current, status
+    directory = user_dir(user)
+    os.makedirs(directory, exist_ok=True)
+    remove_finished(directory)
+    paths = (
+        job_path(user, current, 'pdf'),
+        job_path(user, current, 'pending'),
+        job_path(user, current, 'error'),
+    )
+    open(paths[1], 'w').close()
+    executor = get_executor()
+    try:
+        future = executor.submit(render, ingredients, *paths)
+    except BrokenProcessPool:
+        reset_executor(executor)
+        executor = get_executor()
+        future = executor.submit(render, ingredients, *paths)
+    future.add_done_callback(
+        lambda future: on_done(future, executor, *paths)
+    )
+    return current, PENDING
+
+
+def remove_finished(directory):
+    """Удаляет файлы завершённых задач; идущий рендеринг не трогается."""
+    names = os.listdir(directory)
+    rendering = {
+        name.split('.')[0] for name in names if name.endswith('.pending')
+    }
+    for name in names:
+        if name.split('.')[0] not in rendering:
+            try:
+                os.remove(os.path.join(directory, name))
+            except FileNotFoundError:
+                pass
+
+
+def on_done(future, executor, pdf_path, pending_path, error_path):
+    """Отмечает задачу, процесс которой погиб, не успев записать итог."""
+    error = 'cancelled' if future.cancelled() else future.exception()
+    if error is None:
+        return
+    if isinstance(error, BrokenProcessPool):
+        reset_executor(executor)
+    with open(error_path, 'w') as file:
+        file.write(repr(error))
+    if os.path.exists(pending_path):
+        os.remove(pending_path)
+
+
+def render(ingredients, pdf_path, pending_path, error_path):
+    """Выполняется в процессе пула: пишет PDF атомарно через rename."""
+    try:
+        # Задачу, превысившую PENDING_TIMEOUT, могут поставить заново,
+        # пока прежний рендеринг ещё идёт: у каждого свой временный файл.
+        temporary = f'{pdf_path}.{os.getpid()}.tmp'
+        with pdf_generate(ingredients) as source:
+            with open(temporary, 'wb') as target:
+                shutil.copyfileobj(source, target)
+        os.replace(temporary, pdf_path)
+    except Exception as error:
+        with open(error_path, 'w') as file:
+            file.write(repr(error))
+    finally:
+        if os.path.exists(pending_path):
+            os.remove(pending_path)
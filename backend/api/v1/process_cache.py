@@ -0,0 +1,49 @@
+"""Данные, собранные в памяти процесса.
+
+Наследник собирает данные в build(). Сборка выполняется при первом
+обращении и повторяется после invalidate(), которую вызывают сигналы
+моделей. Изменения из других процессов сигналы не видят, поэтому они
+подхватываются не позже чем через ttl секунд.
+
+invalidate() меняет поколение кеша, а сборка запоминает поколение, с
+которого начала. Сброс, пришедший во время сборки, поэтому не теряется:
+собранные данные уже считаются устаревшими.
+"""
+import abc
+import itertools
+import threading
+import time
+
+
+class ProcessCache(abc.ABC):
+    ttl = 5 * 60
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.built = None
+        self.generations = itertools.count()
+        self.generation = next(self.generations)
+        self.built_generation = None
+
+    def invalidate(self):
+        self.generation = next(self.generations)
+
+    def is_stale(self):
+        return (
+            self.built is None
+            or self.built_generation != self.generation
+            or time.monotonic() - self.built > self.ttl
+        )
+
+    @abc.abstractmethod
+    def build(self):
+        """Собирает данные кеша; вызывается под блокировкой."""
+
+    def ensure_built(self):
+        if self.is_stale():
+            with self.lock:
+                if self.is_stale():
+                    generation = self.generation
+                    self.build()
+                    self.built = time.monotonic()
+                    self.built_generation = generation
@@ -0,0 +1,83 @@
+"""Форматы выгрузки списка покупок.
+
+Формат выбирается обычным согласованием содержимого DRF: по заголовку
+``Accept`` или параметру ``?format=``. По умолчанию, как и раньше,
+отдаётся PDF. Текст, CSV и JSON собираются построчно из тех же строк
+списка и отдаются потоком, без рендеринга в reportlab.
+"""
+import csv
+import json
+
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+
+
+class ShoppingListRenderer(BaseRenderer):
+    charset = 'utf-8'
+    # Отдавать ли выгрузку файлом, а не показывать в браузере.
+    attachment = False
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        # Сам список отдаётся потоком из представления: PDF собирается
+        # pdf_generate, остальные форматы — методом stream наследника.
+        # Через рендерер проходят только ответы с ошибками.
+        renderer_context['response']['Content-Type'] = (
+            JSONRenderer.media_type
+        )
+        return JSONRenderer().render(data)
+
+
+class ShoppingListPDFRenderer(ShoppingListRenderer):
+    media_type = 'application/pdf'
+    format = 'pdf'
+    charset = None
+    render_style = 'binary'
+    attachment = True
+
+
+class ShoppingListTextRenderer(ShoppingListRenderer):
+    media_type = 'text/plain'
+    format = 'txt'
+
+    def stream(self, ingredients):
+        for row in ingredients:
+            yield '{name} - {amount} {measurement_unit}\n'.format(**row)
+
+
+class Echo:
+    """Файл для csv.writer, который просто возвращает записанное."""
+
+    def write(self, value):
+        return value
+
+
+class ShoppingListCSVRenderer(ShoppingListRenderer):
+    media_type = 'text/csv'
+    format = 'csv'
+    attachment = True
+    header = ('name', 'amount', 'measurement_unit')
+
+    def stream(self, ingredients):
+        writer = csv.writer(Echo())
+        yield writer.writerow(self.header)
+        for row in ingredients:
+            yield writer.writerow([row[field] for field in self.header])
+
+
+class ShoppingListJSONRenderer(ShoppingListRenderer):
+    media_type = 'application/json'
+    format = 'json'
+
+    def stream(self, ingredients):
+        separator = '['
+        for row in ingredients:
+            yield separator + json.dumps(row, ensure_ascii=False)
+            separator = ','
+        yield ']' if separator == ',' else '[]'
+
+
+SHOPPING_LIST_RENDERERS = (
+    ShoppingListPDFRenderer,
+    ShoppingListTextRenderer,
+    ShoppingListCSVRenderer,
+    ShoppingListJSONRenderer,
+)
@@ -0,0 +1,79 @@
+"""Кеш готовых ответов списка рецептов для анонимных посетителей.
+
+Ключ строится из нормализованной строки запроса (параметры отсортированы)
+и глобальной версии списка. Любое изменение рецептов, тегов или
+ингредиентов рецептов меняет версию (см. signals), и старые ответы
+перестают находиться, а затем вытесняются по таймауту. Версия —
+случайная строка, а не счётчик, чтобы после вытеснения ключа версии из
+кеша не найти старые ответы снова.
+
+Используется стандартный кеш Django, поэтому работают и локальный
+LocMemCache, и файловый FileBasedCache. У LocMemCache свой кеш в каждом
+процессе, и изменения из других процессов видны не позже чем через
+RECIPE_LIST_CACHE_TIMEOUT секунд.
+"""
+import hashlib
+import uuid
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+
+VERSION_KEY = 'recipes:list:version'
+
+
+def version(key=VERSION_KEY):
+    """Текущая версия под ключом key; по умолчанию — версия списка."""
+    current = cache.get(key)
+    if current is None:
+        cache.add(key, uuid.uuid4().hex, None)
+        current = cache.get(key)
+    return current
+
+
+def bump_version(key=VERSION_KEY):
+    cache.set(key, uuid.uuid4().hex, None)
+
+
+def normalized_query(params, ignored=()):
+    """Строка запроса с отсортированными параметрами, кроме ignored."""
+    return urlencode(sorted(
+        (name, value)
+        for name in params if name not in ignored
+        for value in params.getlist(name)
+    ))
+
+
+def cache_key(request):
+    query = normalized_query(request.query_params)
+    origin = f'{request.scheme}://{request.get_host()}{request.path}'
+    digest = hashlib.md5(f'{origin}?{query}'.encode()).hexdigest()
+    return f'recipes:list:{version()}:{digest}'
+
+
+def is_cacheable(request):
+    return (
+        request.user.is_anonymous
+        and request.accepted_renderer.format == 'json'
+    )
+
+
+def get(key):
+    cached = cache.get(key)
+    if cached is None:
+        return None
+    content, content_type = cached
+    return HttpResponse(content, content_type=content_type)
+
+
+def store(key, response):
+    """Кладёт ответ в кеш, когда DRF его отрендерит."""
+    if response.status_code != 200:
+        return response
+    response.add_post_render_callback(lambda rendered: cache.set(
+        key,
+        (rendered.content, rendered['Content-Type']),
+        settings.RECIPE_LIST_CACHE_TIMEOUT,
+    ))
+    return response
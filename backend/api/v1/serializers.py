@@ -1,8 +1,17 @@
+from urllib.parse import unquote, urlparse
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Prefetch, prefetch_related_objects
+from djoser.serializers import CurrentPasswordSerializer
 from drf_base64.fields import Base64ImageField
+from recipes import shopping_list
 from recipes.models import (Ingredient, IngredientInRecipe, Recipe, Subscribe,
                             Tag)
+from recipes.storage import image_storage
 from rest_framework.serializers import (CharField, EmailField, IntegerField,
-                                        ModelSerializer, ReadOnlyField,
+                                        ListField, ModelSerializer,
+                                        ReadOnlyField, Serializer,
                                         SerializerMethodField, ValidationError)
 from users.models import User
 
@@ -21,9 +30,29 @@ class UserSerializer(ModelSerializer):
         user = self.context.get('request').user
         if not user.is_authenticated:
             return False
+        if hasattr(obj, 'is_subscribed'):
+            return obj.is_subscribed
         return user.subscriber.filter(author=obj).exists()
 
 
+class SetUsernameSerializer(ModelSerializer, CurrentPasswordSerializer):
+    """Смена имени пользователя.
+
+    Сериализатор djoser называет поле по LOGIN_FIELD (new_email), а его
+    представление читает new_<USERNAME_FIELD>, поэтому поле названо здесь.
+    """
+
+    class Meta:
+        model = User
+        fields = (User.USERNAME_FIELD, 'current_password')
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields[f'new_{User.USERNAME_FIELD}'] = self.fields.pop(
+            User.USERNAME_FIELD
+        )
+
+
 class UserCreateSerializer(ModelSerializer):
     """Позволяет зарегистрироваться новому пользователю."""
     password = CharField(
@@ -94,11 +123,63 @@ class IngredientInRecipeSerializer(ModelSerializer):
         return data
 
 
+class ThumbnailsField(ReadOnlyField):
+    """Ссылки на уменьшенные копии картинки: {размер: {формат: url}}.
+
+    Копии строятся в фоне после загрузки, до этого поле пустое.
+    """
+
+    def __init__(self, **kwargs):
+        kwargs['source'] = 'image_variants'
+        super().__init__(**kwargs)
+
+    def to_representation(self, variants):
+        request = self.context.get('request')
+        thumbnails = {}
+        for size, formats in variants.get('sizes', {}).items():
+            thumbnails[size] = {}
+            for image_format, name in formats.items():
+                url = image_storage.url(name)
+                if request is not None:
+                    url = request.build_absolute_uri(url)
+                thumbnails[size][image_format] = url
+        return thumbnails
+
+
+class RecipeImageField(Base64ImageField):
+    """Картинка в base64 или ссылка на уже сохранённую картинку.
+
+    Ссылка на файл из хранилища картинок принимается как есть: файл не
+    загружается и не перекодируется заново, рецепт просто ссылается на
+    него. Так копия рецепта не дублирует картинку на диске.
+    """
+
+    def stored_name(self, data):
+        if not isinstance(data, str) or data.startswith('data:'):
+            return None
+        path = unquote(urlparse(data).path)
+        if not path.startswith(settings.MEDIA_URL):
+            return None
+        name = path[len(settings.MEDIA_URL):]
+        if image_storage.is_content_addressed(name) and (
+            image_storage.exists(name)
+        ):
+            return name
+        return None
+
+    def to_internal_value(self, data):
+        name = self.stored_name(data)
+        if name is not None:
+            return name
+        return super().to_internal_value(data)
+
+
 class RecipeReadSerializer(ModelSerializer):
     author = UserSerializer(many=False, read_only=True)
     tags = TagSerializer(many=True)
     ingredients = IngredientInRecipeSerializer(many=True, source='recipe')
     image = Base64ImageField()
+    thumbnails = ThumbnailsField()
     is_favorited = SerializerMethodField(
         read_only=True,
         method_name='get_is_favorited'
@@ -111,27 +192,72 @@ class RecipeReadSerializer(ModelSerializer):
     class Meta:
         model = Recipe
         fields = (
-            'id', 'tags', 'name', 'author', 'ingredients', 'image', 'text',
-            'cooking_time', 'is_favorited', 'is_in_shopping_cart',
+            'id', 'tags', 'name', 'author', 'ingredients', 'image',
+            'thumbnails', 'text', 'cooking_time', 'is_favorited',
+            'is_in_shopping_cart', 'favorites_count',
         )
 
     def get_is_favorited(self, recipe):
         user = self.context.get('request').user
         if user.is_anonymous:
             return False
+        if hasattr(recipe, 'favorited'):
+            return recipe.favorited
         return recipe.is_favorited.filter(author=user).exists()
 
     def get_is_in_shopping_cart(self, recipe):
         user = self.context.get('request').user
         if user.is_anonymous:
             return False
+        if hasattr(recipe, 'in_shopping_cart'):
+            return recipe.in_shopping_cart
         return recipe.is_in_shopping_cart.filter(author=user).exists()
 
 
+class SharedAuthorSerializer(UserSerializer):
+    is_subscribed = None
+
+    class Meta(UserSerializer.Meta):
+        fields = ('email', 'id', 'username', 'first_name', 'last_name')
+
+
+class RecipeSharedSerializer(RecipeReadSerializer):
+    """Одинаковая для всех пользователей часть RecipeReadSerializer."""
+    author = SharedAuthorSerializer(read_only=True)
+    image = None
+    thumbnails = None
+    is_favorited = None
+    is_in_shopping_cart = None
+
+    class Meta(RecipeReadSerializer.Meta):
+        fields = (
+            'id', 'tags', 'name', 'author', 'ingredients', 'text',
+            'cooking_time',
+        )
+
+
+class RecipePersonalSerializer(RecipeReadSerializer):
+    """Часть RecipeReadSerializer, зависящая от пользователя и запроса.
+
+    Все поля берутся из самой строки рецепта и её аннотаций, поэтому
+    сериализация не делает запросов.
+    """
+    author = None
+    tags = None
+    ingredients = None
+
+    class Meta(RecipeReadSerializer.Meta):
+        fields = (
+            'image', 'thumbnails', 'is_favorited', 'is_in_shopping_cart',
+            'favorites_count',
+        )
+
+
 class RecipeCreateSerializer(ModelSerializer):
     ingredients = IngredientInRecipeSerializer(many=True, read_only=True)
+    tags = ListField(child=IntegerField(), write_only=True)
     author = UserSerializer(many=False, read_only=True)
-    image = Base64ImageField()
+    image = RecipeImageField()
 
     class Meta:
         model = Recipe
@@ -147,22 +273,32 @@ class RecipeCreateSerializer(ModelSerializer):
             raise ValidationError('Добавьте хотя бы один тег')
         if not ingredients:
             raise ValidationError('Добавьте хотя бы один ингредиент.')
-        ingredient_list = []
+        amounts = {}
         for ingredient in ingredients:
-            ingredient_id = ingredient['id']
-            if ingredient_id in ingredient_list:
-                raise ValidationError('Ингредиент должен быть уникальным!')
-            ingredient_list.append(ingredient_id)
             try:
-                int(ingredient['amount'])
+                ingredient_id = int(ingredient['id'])
+                amount = int(ingredient['amount'])
             except ValueError:
                 raise ValidationError(
                     'Кол-во ингредиентов должно быть указано только цифрами.'
                 )
-            if int(ingredient['amount']) <= 0:
+            if ingredient_id in amounts:
+                raise ValidationError('Ингредиент должен быть уникальным!')
+            if amount <= 0:
                 raise ValidationError('Укажите вес/количество ингредиентов')
+            amounts[ingredient_id] = amount
+        found = Ingredient.objects.filter(id__in=amounts).count()
+        if found != len(amounts):
+            raise ValidationError('Указан несуществующий ингредиент.')
+        data['ingredients'] = amounts
         return data
 
+    def validate_tags(self, tags):
+        tags = set(tags)
+        if Tag.objects.filter(id__in=tags).count() != len(tags):
+            raise ValidationError('Указан несуществующий тег.')
+        return tags
+
     def validate_name(self, name):
         if len(name) < 3:
             raise ValidationError(
@@ -189,36 +325,89 @@ class RecipeCreateSerializer(ModelSerializer):
             )
         return text[0].upper() + text[1:]
 
-    def create_ingredients(self, ingredients, recipe):
-        for ingredient in ingredients:
+    def create_ingredients(self, amounts, recipe):
+        IngredientInRecipe.objects.bulk_create(
             IngredientInRecipe(
                 recipe=recipe,
-                ingredient_id=ingredient['id'],
-                amount=ingredient.get('amount')
-            ).save()
+                ingredient_id=ingredient_id,
+                amount=amount
+            )
+            for ingredient_id, amount in amounts.items()
+        )
 
+    def update_ingredients(self, amounts, recipe):
+        """Применяет к рецепту только разницу с сохранёнными ингредиентами.
+
+        Вклад рецепта в списки покупок пересчитывается, только если
+        ингредиенты действительно изменились.
+        """
+        existing = {
+            row.ingredient_id: row
+            for row in IngredientInRecipe.objects.filter(
+                recipe=recipe
+            ).order_by()
+        }
+        removed = existing.keys() - amounts.keys()
+        changed = []
+        for ingredient_id, amount in amounts.items():
+            row = existing.get(ingredient_id)
+            if row is not None and row.amount != amount:
+                row.amount = amount
+                changed.append(row)
+        added = {
+            ingredient_id: amount
+            for ingredient_id, amount in amounts.items()
+            if ingredient_id not in existing
+        }
+        if not (removed or changed or added):
+            return
+        with shopping_list.editing([recipe.pk]):
+            if removed:
+                IngredientInRecipe.objects.filter(
+                    recipe=recipe, ingredient_id__in=removed
+                ).delete()
+            IngredientInRecipe.objects.bulk_update(changed, ('amount',))
+            self.create_ingredients(added, recipe)
+
+    @transaction.atomic
     def create(self, validated_data):
-        ingredients = self.initial_data.get('ingredients')
+        ingredients = validated_data.pop('ingredients')
         tags = validated_data.pop('tags')
         recipe = Recipe.objects.create(
             author=self.context['request'].user,
             **validated_data
         )
-        recipe.tags.set(tags)
+        Recipe.tags.through.objects.bulk_create(
+            Recipe.tags.through(recipe=recipe, tag_id=tag_id)
+            for tag_id in tags
+        )
         self.create_ingredients(ingredients, recipe)
+        # Новый рецепт ещё никто не добавил в избранное и в корзину.
+        recipe.favorited = recipe.in_shopping_cart = False
         return recipe
 
+    @transaction.atomic
     def update(self, recipe, validated_data):
-        recipe.ingredients.clear()
-        recipe.tags.clear()
-        ingredients = self.initial_data.get('ingredients')
+        ingredients = validated_data.pop('ingredients')
         tags = validated_data.pop('tags')
         recipe.tags.set(tags)
-        IngredientInRecipe.objects.filter(recipe=recipe).all().delete()
-        self.create_ingredients(ingredients, recipe)
-        return super().update(recipe, validated_data)
+        self.update_ingredients(ingredients, recipe)
+        for attr, value in validated_data.items():
+            setattr(recipe, attr, value)
+        recipe.save_edited()
+        return recipe
 
     def to_representation(self, instance):
+        prefetch_related_objects(
+            [instance],
+            'tags',
+            Prefetch(
+                'recipe',
+                queryset=IngredientInRecipe.objects.select_related(
+                    'ingredient'
+                )
+            ),
+        )
         data = RecipeReadSerializer(
             instance,
             context={'request': self.context.get('request')}
@@ -227,10 +416,11 @@ class RecipeCreateSerializer(ModelSerializer):
 
 
 class UniversalSerializer(ModelSerializer):
+    thumbnails = ThumbnailsField()
 
     class Meta:
         model = Recipe
-        fields = ('id', 'name', 'image', 'cooking_time')
+        fields = ('id', 'name', 'image', 'thumbnails', 'cooking_time')
         read_only_fields = ('id', 'name', 'image', 'cooking_time')
 
 
@@ -241,12 +431,13 @@ class SubscribeSerializer(UserSerializer):
     last_name = ReadOnlyField(source='author.last_name')
     is_subscribed = SerializerMethodField()
     recipes = SerializerMethodField()
+    recipes_count = ReadOnlyField(source='author.recipes_count')
 
     class Meta:
         model = User
         fields = (
             'id', 'username', 'first_name', 'last_name',
-            'is_subscribed', 'recipes',
+            'is_subscribed', 'recipes', 'recipes_count',
         )
 
     def validate(self, attrs):
@@ -266,9 +457,27 @@ class SubscribeSerializer(UserSerializer):
     def get_is_subscribed(self, username):
         return True
 
-    def get_recipes(self, data):
-        limit = self.context.get('request').query_params.get('recipes_limit')
+    @staticmethod
+    def recipes_limit(request):
+        limit = request.query_params.get('recipes_limit')
         if not limit:
             limit = 3
-        recipes = data.author.recipe.all()[:int(limit)]
+        return int(limit)
+
+    def get_recipes(self, data):
+        # Страница подписок заранее загружает превью всех авторов
+        # одним запросом, см. CustomUserViewSet.subscriptions.
+        recipes = getattr(data.author, 'recipe_previews', None)
+        if recipes is None:
+            limit = self.recipes_limit(self.context.get('request'))
+            recipes = data.author.recipe.all()[:limit]
         return UniversalSerializer(recipes, many=True).data
+
+
+class BatchSerializer(Serializer):
+    """Список id для пакетного добавления или удаления."""
+    ids = ListField(
+        child=IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=settings.BATCH_MAX_SIZE,
+    )
@@ -0,0 +1,52 @@
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+from recipes.images import variants_saved
+from recipes.links import links_changed
+from recipes.models import (FavoriteRecipe, Ingredient, IngredientInRecipe,
+                            Recipe, ShoppingCart, Tag)
+from recipes.signals import author_changed
+
+from . import facets, response_cache
+from .autocomplete import ingredient_index
+from .payload_cache import ingredient_payloads, tag_payloads
+from .tag_slugs import tag_slugs
+
+
+@receiver((post_save, post_delete), sender=Ingredient)
+def invalidate_ingredient_index(**kwargs):
+    ingredient_index.invalidate()
+    ingredient_payloads.invalidate()
+
+
+@receiver((post_save, post_delete), sender=Tag)
+def invalidate_tag_payloads(**kwargs):
+    tag_payloads.invalidate()
+    tag_slugs.invalidate()
+
+
+# Удаление строк IngredientInRecipe не отслеживается: оно всегда идёт
+# вместе с сохранением или удалением рецепта, а приёмник post_delete
+# лишил бы каскадное удаление рецепта быстрого пути. Число добавлений в
+# избранное и пути к уменьшенным копиям входят в ответ и меняются через
+# update(), поэтому о них сообщают свои сигналы. Из сохранений автора
+# версию меняют только те, что затрагивают его данные в ответе.
+@receiver(links_changed, sender=FavoriteRecipe)
+@receiver(variants_saved)
+@receiver(author_changed)
+@receiver((post_save, post_delete), sender=Recipe)
+@receiver((post_save, post_delete), sender=Tag)
+@receiver((post_save, post_delete), sender=Ingredient)
+@receiver(post_save, sender=IngredientInRecipe)
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def bump_recipe_list_version(**kwargs):
+    # Версия меняется после коммита: до него читатели видят старые
+    # данные и кладут их под старой версией.
+    transaction.on_commit(response_cache.bump_version)
+
+
+# Избранное и корзина входят в счётчики фасетов пользователя.
+@receiver(links_changed, sender=FavoriteRecipe)
+@receiver(links_changed, sender=ShoppingCart)
+def bump_facets_version(user_id, **kwargs):
+    transaction.on_commit(lambda: facets.bump_user_version(user_id))
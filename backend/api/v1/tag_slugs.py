@@ -0,0 +1,47 @@
+"""Соответствие slug -> id тегов в памяти процесса.
+
+Фильтр рецептов по тегам получает id без запроса к таблице тегов
+(см. process_cache). Незнакомый slug перечитывает соответствие, так что
+тег, созданный другим процессом, находится почти сразу. Перечитывается
+оно не чаще раза в MISSING_RELOAD_INTERVAL секунд, иначе запросы с
+выдуманными slug обходили бы кеш.
+"""
+import time
+
+from recipes.models import Tag
+
+from .process_cache import ProcessCache
+
+MISSING_RELOAD_INTERVAL = 10
+
+
+class TagSlugs(ProcessCache):
+
+    def __init__(self):
+        super().__init__()
+        self.ids = {}
+
+    def build(self):
+        self.ids = dict(Tag.objects.values_list('slug', 'id'))
+
+    def slugs(self):
+        """Копия соответствия slug -> id."""
+        self.ensure_built()
+        return dict(self.ids)
+
+    def resolve(self, slugs):
+        """id тегов по списку slug; неизвестные slug пропускаются."""
+        self.ensure_built()
+        built = self.built
+        if (
+            any(slug not in self.ids for slug in slugs)
+            and built is not None
+            and time.monotonic() - built > MISSING_RELOAD_INTERVAL
+        ):
+            self.invalidate()
+            self.ensure_built()
+        ids = self.ids
+        return [ids[slug] for slug in slugs if slug in ids]
+
+
+tag_slugs = TagSlugs()
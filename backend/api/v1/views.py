@@ -1,10 +1,17 @@
-from django.db.models import Sum
-from django.http import HttpResponse
+from django.db import connection
+from django.db.models import (BooleanField, Exists, F, OuterRef, Prefetch,
+                              Value, Window, prefetch_related_objects)
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import RowNumber
+from django.http import FileResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
+from django.utils.cache import (get_conditional_response, patch_cache_control,
+                                patch_vary_headers)
 from django_filters.rest_framework import DjangoFilterBackend
 from djoser.views import UserViewSet
-from recipes.models import (FavoriteRecipe, Ingredient, IngredientInRecipe,
-                            Recipe, ShoppingCart, Subscribe, Tag)
+from recipes import links, shopping_list
+from recipes.models import (FavoriteRecipe, Ingredient, Recipe, ShoppingCart,
+                            Subscribe, Tag)
 from rest_framework import status, viewsets
 from rest_framework.decorators import action
 from rest_framework.permissions import (IsAuthenticated,
@@ -12,19 +19,69 @@ from rest_framework.permissions import (IsAuthenticated,
 from rest_framework.response import Response
 from users.models import User
 
+from . import batch, facets, fragments, pdf_jobs, response_cache
+from .autocomplete import ingredient_index
 from .filters import IngredientFilter, RecipeFilter
-from .pagination import LimitPagination
+from .pagination import CursorLimitPagination, FeedPagination, LimitPagination
+from .payload_cache import ingredient_payloads, tag_payloads
 from .pdf_generate import pdf_generate
 from .permissions import IsAdminOrAuthorOrReadOnly
-from .serializers import (IngredientSerializer, RecipeCreateSerializer,
-                          RecipeReadSerializer, SubscribeSerializer,
-                          TagSerializer, UniversalSerializer)
+from .renderers import SHOPPING_LIST_RENDERERS, ShoppingListPDFRenderer
+from .serializers import (BatchSerializer, IngredientSerializer,
+                          RecipeCreateSerializer, RecipeReadSerializer,
+                          SubscribeSerializer, TagSerializer,
+                          UniversalSerializer)
+
+
+def recipes_for(user):
+    """Рецепты с флагами избранного, корзины и подписки для user.
+
+    Флаги считаются подзапросами в том же запросе, что и сами рецепты;
+    остальное представление рецепта берётся из кеша fragments.
+    """
+    queryset = Recipe.objects.select_related('author')
+    if user.is_anonymous:
+        return queryset.annotate(
+            favorited=Value(False, output_field=BooleanField()),
+            in_shopping_cart=Value(False, output_field=BooleanField()),
+            author_subscribed=Value(False, output_field=BooleanField()),
+        )
+    return queryset.annotate(
+        favorited=Exists(FavoriteRecipe.objects.filter(
+            author=user, recipe=OuterRef('pk')
+        )),
+        in_shopping_cart=Exists(ShoppingCart.objects.filter(
+            author=user, recipe=OuterRef('pk')
+        )),
+        author_subscribed=Exists(Subscribe.objects.filter(
+            user=user, author=OuterRef('author')
+        )),
+    )
+
+
+def batch_response(model, request):
+    """Пакетная версия добавления и удаления связей: {"ids": [...]}."""
+    serializer = BatchSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+    apply = batch.add if request.method == 'POST' else batch.remove
+    return Response(
+        apply(model, request.user, serializer.validated_data['ids'])
+    )
 
 
 class CustomUserViewSet(UserViewSet):
     queryset = User.objects.all()
     pagination_class = LimitPagination
 
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        user = self.request.user
+        if user.is_anonymous:
+            return queryset
+        return queryset.annotate(is_subscribed=Exists(
+            Subscribe.objects.filter(user=user, author=OuterRef('pk'))
+        ))
+
     @action(
         detail=True,
         methods=['POST', 'DELETE'],
@@ -32,62 +89,187 @@ class CustomUserViewSet(UserViewSet):
         permission_classes=[IsAuthenticatedOrReadOnly],
     )
     def subscribe(self, request, **kwargs):
-        user = get_object_or_404(User, id=kwargs.get('id'))
-        subscribe = Subscribe.objects.filter(user=request.user, author=user)
-        if request.method == 'POST':
-            if user == request.user:
-                msg = {'error': 'Нельзя подписаться на самого себя.'}
-                return Response(msg, status=status.HTTP_400_BAD_REQUEST)
-            obj, created = Subscribe.objects.get_or_create(
-                user=request.user,
-                author=user
-            )
-            if not created:
-                msg = {'error': 'Вы уже подписаны на этого пользователя.'}
-                return Response(msg, status=status.HTTP_400_BAD_REQUEST)
-            serializer = SubscribeSerializer(obj, context={'request': request})
-            return Response(serializer.data, status=status.HTTP_201_CREATED)
-        if not subscribe.exists():
+        if request.method == 'DELETE':
+            if links.unlink(Subscribe, request.user.pk, kwargs.get('id')):
+                return Response(status=status.HTTP_204_NO_CONTENT)
+            get_object_or_404(User, id=kwargs.get('id'))
             msg = {'error': 'Вы не подписаны на этого пользователя.'}
             return Response(msg, status=status.HTTP_400_BAD_REQUEST)
-        subscribe.delete()
-        return Response(status=status.HTTP_204_NO_CONTENT)
+        user = get_object_or_404(User, id=kwargs.get('id'))
+        if user == request.user:
+            msg = {'error': 'Нельзя подписаться на самого себя.'}
+            return Response(msg, status=status.HTTP_400_BAD_REQUEST)
+        if not links.link(Subscribe, request.user.pk, user.pk):
+            msg = {'error': 'Вы уже подписаны на этого пользователя.'}
+            return Response(msg, status=status.HTTP_400_BAD_REQUEST)
+        serializer = SubscribeSerializer(
+            Subscribe(user=request.user, author=user),
+            context={'request': request},
+        )
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+    @action(
+        detail=False,
+        methods=['POST', 'DELETE'],
+        url_path='subscribe',
+        url_name='subscribe-batch',
+        permission_classes=[IsAuthenticated],
+    )
+    def subscribe_batch(self, request):
+        return batch_response(Subscribe, request)
 
     @action(
         detail=False,
         methods=['GET'],
-        permission_classes=[IsAuthenticatedOrReadOnly],
+        permission_classes=[IsAuthenticated],
+        pagination_class=CursorLimitPagination,
     )
     def subscriptions(self, request):
-        subscribe = Subscribe.objects.filter(user=request.user)
+        subscribe = Subscribe.objects.filter(
+            user=request.user
+        ).select_related('author')
         pages = self.paginate_queryset(subscribe)
+        authors = [item.author for item in pages]
+        if authors:
+            limit = SubscribeSerializer.recipes_limit(request)
+            prefetch_related_objects(authors, Prefetch(
+                'recipe',
+                queryset=self.recipe_previews(authors, limit),
+                to_attr='recipe_previews',
+            ))
         serializer = SubscribeSerializer(
             pages, many=True, context={'request': request}
         )
         return self.get_paginated_response(serializer.data)
 
+    @action(
+        detail=False,
+        methods=['GET'],
+        permission_classes=[IsAuthenticated],
+        pagination_class=FeedPagination,
+    )
+    def feed(self, request):
+        """Рецепты авторов, на которых подписан пользователь."""
+        entries = self.paginate_queryset(request.user.timeline.all())
+        prefetch_related_objects(
+            entries, Prefetch('recipe', queryset=recipes_for(request.user))
+        )
+        return self.get_paginated_response(fragments.serialize_recipes(
+            [entry.recipe for entry in entries], request
+        ))
+
+    @staticmethod
+    def recipe_previews(authors, limit):
+        """Последние limit рецептов каждого из авторов одним запросом.
+
+        Рецепты нумеруются оконной функцией внутри автора. Django 3.2 не
+        умеет фильтровать по оконным выражениям, поэтому нумерация
+        оборачивается в подзапрос.
+        """
+        numbered = Recipe.objects.filter(author__in=authors).annotate(
+            position=Window(
+                RowNumber(),
+                partition_by=[F('author')],
+                order_by=[F('pub_date').desc(), F('id').desc()],
+            )
+        ).order_by().values('pk', 'position')
+        sql, params = numbered.query.sql_with_params()
+        quote = connection.ops.quote_name
+        return Recipe.objects.filter(pk__in=RawSQL(
+            f'SELECT {quote("id")} FROM ({sql}) numbered '
+            f'WHERE {quote("position")} <= %s',
+            (*params, limit),
+        )).order_by('-pub_date', '-id')
+
+
+class CachedPayloadMixin:
+    """Отдаёт list и retrieve из кеша готовых JSON-ответов."""
+
+    payloads = None
+
+    def list(self, request, *args, **kwargs):
+        return self.payloads.response(request, self.payloads.get())
+
+    def retrieve(self, request, *args, **kwargs):
+        pk = kwargs.get(self.lookup_field)
+        payload = self.payloads.get(int(pk)) if pk.isdigit() else None
+        if payload is None:
+            return super().retrieve(request, *args, **kwargs)
+        return self.payloads.response(request, payload)
 
-class TagViewSet(viewsets.ModelViewSet):
+
+class TagViewSet(CachedPayloadMixin, viewsets.ModelViewSet):
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
     permission_classes = (IsAuthenticatedOrReadOnly,)
+    payloads = tag_payloads
 
 
-class IngredientViewSet(viewsets.ModelViewSet):
+class IngredientViewSet(CachedPayloadMixin, viewsets.ModelViewSet):
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
     permission_classes = (IsAuthenticatedOrReadOnly,)
     filter_backends = (IngredientFilter,)
     search_fields = ('^name',)
+    payloads = ingredient_payloads
+
+    def list(self, request, *args, **kwargs):
+        name = request.query_params.get(IngredientFilter.search_param)
+        if name:
+            return Response(ingredient_index.search(name))
+        return super().list(request, *args, **kwargs)
 
 
 class RecipeViewSet(viewsets.ModelViewSet):
     queryset = Recipe.objects.all()
-    pagination_class = LimitPagination
+    pagination_class = CursorLimitPagination
     filterset_class = RecipeFilter
     permission_classes = (IsAdminOrAuthorOrReadOnly,)
     filter_backends = (DjangoFilterBackend,)
 
+    def get_queryset(self):
+        return recipes_for(self.request.user)
+
+    def list(self, request, *args, **kwargs):
+        if not response_cache.is_cacheable(request):
+            return self.list_recipes(request)
+        key = response_cache.cache_key(request)
+        cached = response_cache.get(key)
+        if cached is not None:
+            return cached
+        return response_cache.store(key, self.list_recipes(request))
+
+    def list_recipes(self, request):
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            response = self.get_paginated_response(
+                fragments.serialize_recipes(page, request)
+            )
+        else:
+            response = Response(
+                fragments.serialize_recipes(list(queryset), request)
+            )
+        if facets.requested(request):
+            if page is None:
+                response.data = {'results': response.data}
+            response.data['facets'] = facets.facets(request, queryset)
+        return response
+
+    def retrieve(self, request, *args, **kwargs):
+        recipe = self.get_object()
+        etag = fragments.etag(recipe)
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = Response(
+                fragments.serialize_recipes([recipe], request)[0]
+            )
+        # Last-Modified не отдаётся: флаги пользователя не меняют дату
+        # изменения рецепта, и ответ по If-Modified-Since устаревал бы.
+        response['ETag'] = etag
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
+
     def get_serializer_class(self):
         if self.request.method in ['POST', 'PATCH', 'PUT']:
             return RecipeCreateSerializer
@@ -95,19 +277,15 @@ class RecipeViewSet(viewsets.ModelViewSet):
 
     def add_recipe(self, model, request, pk):
         recipe = get_object_or_404(Recipe, id=pk)
-        models = model.objects.filter(author=request.user, recipe=recipe)
-        if models.exists():
+        if not links.link(model, request.user.pk, recipe.pk):
             return Response(status=status.HTTP_400_BAD_REQUEST)
-        model(author=request.user, recipe=recipe).save()
         serializer = UniversalSerializer(recipe)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
     def del_recipe(self, model, request, pk):
-        recipe = get_object_or_404(Recipe, id=pk)
-        models = model.objects.filter(author=request.user, recipe=recipe)
-        if models.exists():
-            models.delete()
+        if links.unlink(model, request.user.pk, pk):
             return Response(status=status.HTTP_204_NO_CONTENT)
+        get_object_or_404(Recipe, id=pk)
         return Response(status=status.HTTP_400_BAD_REQUEST)
 
     @action(
@@ -134,25 +312,97 @@ class RecipeViewSet(viewsets.ModelViewSet):
         if request.method == 'DELETE':
             return self.del_recipe(ShoppingCart, request, kwargs.get('pk'))
 
+    @action(
+        detail=False,
+        methods=['POST', 'DELETE'],
+        url_path='favorite',
+        url_name='favorite-batch',
+        permission_classes=[IsAuthenticated],
+    )
+    def favorite_batch(self, request):
+        return batch_response(FavoriteRecipe, request)
+
+    @action(
+        detail=False,
+        methods=['POST', 'DELETE'],
+        url_path='shopping_cart',
+        url_name='shopping-cart-batch',
+        permission_classes=[IsAuthenticated],
+    )
+    def shopping_cart_batch(self, request):
+        return batch_response(ShoppingCart, request)
+
     @action(
         detail=False,
         methods=['GET'],
         permission_classes=(IsAuthenticated,),
+        renderer_classes=SHOPPING_LIST_RENDERERS,
     )
     def download_shopping_cart(self, request):
-        get_cart = IngredientInRecipe.objects.filter(
-            recipe__is_in_shopping_cart__author=request.user
-        ).values(
-            'ingredient__name',
-            'ingredient__measurement_unit'
-        ).annotate(Sum('amount'))
-        response = HttpResponse(content_type='application/pdf')
-        response['Content-Disposition'] = 'attachment;'
-        text_cart = ''
-        for value in get_cart:
-            text_cart += (
-                value['ingredient__name'] + ' - '
-                + str(value['amount__sum']) + ' '
-                + value['ingredient__measurement_unit'] + '<br/>'
+        renderer = request.accepted_renderer
+        ingredients = shopping_list.items_for(request.user).iterator()
+        filename = f'shopping_cart.{renderer.format}'
+        if isinstance(renderer, ShoppingListPDFRenderer):
+            response = FileResponse(
+                pdf_generate(ingredients),
+                as_attachment=True,
+                filename=filename,
+                content_type=renderer.media_type,
             )
-        return pdf_generate(text_cart, response)
+        else:
+            response = StreamingHttpResponse(
+                renderer.stream(ingredients),
+                content_type=f'{renderer.media_type}; '
+                             f'charset={renderer.charset}',
+            )
+            if renderer.attachment:
+                response['Content-Disposition'] = (
+                    f'attachment; filename="{filename}"'
+                )
+        patch_vary_headers(response, ('Accept',))
+        return response
+
+    @action(
+        detail=False,
+        methods=['POST'],
+        url_path='download_shopping_cart/jobs',
+        permission_classes=(IsAuthenticated,),
+    )
+    def download_shopping_cart_job(self, request):
+        job_id, job_status = pdf_jobs.submit(
+            request.user,
+            shopping_list.items_for(request.user)
+        )
+        return Response(
+            {'id': job_id, 'status': job_status},
+            status=status.HTTP_202_ACCEPTED
+        )
+
+    @action(
+        detail=False,
+        methods=['GET'],
+        url_path=r'download_shopping_cart/jobs/(?P<job_id>[0-9a-f]{64})',
+        permission_classes=(IsAuthenticated,),
+    )
+    def download_shopping_cart_result(self, request, job_id):
+        job_status = pdf_jobs.job_status(request.user, job_id)
+        if job_status is None:
+            return Response(status=status.HTTP_404_NOT_FOUND)
+        if job_status == pdf_jobs.FAILED:
+            msg = {'error': 'Не удалось сформировать список покупок.'}
+            return Response(msg, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        if job_status == pdf_jobs.PENDING:
+            return Response(
+                {'id': job_id, 'status': job_status},
+                status=status.HTTP_202_ACCEPTED
+            )
+        try:
+            file = open(pdf_jobs.job_path(request.user, job_id, 'pdf'), 'rb')
+        except FileNotFoundError:
+            return Response(status=status.HTTP_404_NOT_FOUND)
+        return FileResponse(
+            file,
+            as_attachment=True,
+            filename='shopping_cart.pdf',
+            content_type='application/pdf',
+        )
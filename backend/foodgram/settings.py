@@ -20,13 +20,14 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'rest_framework',
     'rest_framework.authtoken',
     'djoser',
     'django_filters',
     'colorfield',
     'recipes',
-    'api',
+    'api.v1.apps.ApiConfig',
     'users'
 ]
 
@@ -73,6 +74,20 @@ DATABASES = {
     }
 }
 
+# По умолчанию кеш живёт в памяти процесса. Для общего кеша всех
+# воркеров без внешних сервисов подойдёт файловый бэкенд:
+# CACHE_BACKEND=django.core.cache.backends.filebased.FileBasedCache
+# и CACHE_LOCATION=/путь/к/каталогу.
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv(
+            'CACHE_BACKEND',
+            default='django.core.cache.backends.locmem.LocMemCache'
+        ),
+        'LOCATION': os.getenv('CACHE_LOCATION', default='foodgram'),
+    }
+}
+
 AUTH_PASSWORD_VALIDATORS = [
     {'NAME': 'django.contrib.auth.password_validation.%s' % validator}
     for validator in [
@@ -100,6 +115,25 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'static')
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+RECIPE_LIST_CACHE_TIMEOUT = int(
+    os.getenv('RECIPE_LIST_CACHE_TIMEOUT', default=60)
+)
+RECIPE_FRAGMENT_CACHE_TIMEOUT = int(
+    os.getenv('RECIPE_FRAGMENT_CACHE_TIMEOUT', default=300)
+)
+RECIPE_FACETS_CACHE_TIMEOUT = int(
+    os.getenv('RECIPE_FACETS_CACHE_TIMEOUT', default=300)
+)
+
+BATCH_MAX_SIZE = int(os.getenv('BATCH_MAX_SIZE', default=100))
+
+IMAGE_WORKERS = int(os.getenv('IMAGE_WORKERS', default=2))
+
+SHOPPING_CART_PDF_ROOT = os.path.join(BASE_DIR, 'shopping_cart_pdf')
+SHOPPING_CART_PDF_WORKERS = int(
+    os.getenv('SHOPPING_CART_PDF_WORKERS', default=2)
+)
+
 REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
@@ -112,10 +146,13 @@ REST_FRAMEWORK = {
 DJOSER = {
     'LOGIN_FIELD': 'email',
     'HIDE_USERS': False,
+    'PASSWORD_RESET_CONFIRM_URL': 'password/reset/confirm/{uid}/{token}',
+    'USERNAME_RESET_CONFIRM_URL': 'username/reset/confirm/{uid}/{token}',
     'SERIALIZERS': {
         'user': 'api.v1.serializers.UserSerializer',
         'current_user': 'api.v1.serializers.UserSerializer',
         'user_create': 'api.v1.serializers.UserCreateSerializer',
+        'set_username': 'api.v1.serializers.SetUsernameSerializer',
     },
     'PERMISSIONS': {
         'user': ('rest_framework.permissions.IsAuthenticated',),
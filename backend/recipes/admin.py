@@ -1,5 +1,6 @@
 from django.contrib import admin
 
+from . import shopping_list
 from .models import (FavoriteRecipe, Ingredient, IngredientInRecipe, Recipe,
                      ShoppingCart, Subscribe, Tag)
 
@@ -42,16 +43,28 @@ class RecipeAdmin(admin.ModelAdmin):
         'text',
         'cooking_time',
         'pub_date',
-        'favorite_count'
+        'favorites_count',
+        'shopping_cart_count',
     )
     search_fields = ('name', 'author', 'tag')
     list_filter = ('name',)
     inlines = (IngredientInRecipeAdmin,)
     empty_value_display = '-пусто-'
 
-    @admin.display(description='В избранном')
-    def favorite_count(self, obj):
-        return obj.is_favorited.count()
+    def save_model(self, request, obj, form, change):
+        if change:
+            obj.save_edited()
+        else:
+            super().save_model(request, obj, form, change)
+
+    def save_related(self, request, form, formsets, change):
+        # Ингредиенты меняются инлайном, вклад рецепта в списки покупок
+        # пересчитывается целиком.
+        if not change:
+            super().save_related(request, form, formsets, change)
+            return
+        with shopping_list.editing([form.instance.pk]):
+            super().save_related(request, form, formsets, change)
 
 
 @admin.register(Subscribe)
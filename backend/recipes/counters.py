@@ -0,0 +1,44 @@
+"""Денормализованные счётчики избранного, покупок, подписчиков и рецептов.
+
+Счётчики рецептов автора меняются сигналами рецептов на единицу, а
+счётчики связей пересчитываются через recount для объектов, которых
+коснулся сигнал links_changed (см. signals).
+"""
+from django.contrib.auth import get_user_model
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import FavoriteRecipe, Recipe, ShoppingCart, Subscribe
+
+User = get_user_model()
+
+# Счётчики: модель-связь -> (поле со ссылкой, модель и поле счётчика).
+COUNTERS = {
+    FavoriteRecipe: ('recipe_id', Recipe, 'favorites_count'),
+    ShoppingCart: ('recipe_id', Recipe, 'shopping_cart_count'),
+    Subscribe: ('author_id', User, 'subscribers_count'),
+    Recipe: ('author_id', User, 'recipes_count'),
+}
+
+
+def count(model, field):
+    """Подзапрос с числом строк model, ссылающихся на текущий объект."""
+    return Coalesce(Subquery(
+        model.objects.filter(
+            **{field: OuterRef('pk')}
+        ).order_by().values(field).annotate(
+            count=Count('pk')
+        ).values('count')
+    ), 0)
+
+
+def recount(sender, pks):
+    """Пересчитывает одним запросом счётчики объектов pks по связи sender.
+
+    Точный пересчёт не зависит от того, сколько строк на самом деле
+    изменилось, поэтому годится и для пакетов, и для гонок.
+    """
+    field, model, counter = COUNTERS[sender]
+    model.objects.filter(pk__in=pks).update(
+        **{counter: count(sender, field[:-len('_id')])}
+    )
@@ -0,0 +1,172 @@
+"""Обработка картинок рецептов.
+
+После загрузки картинка уменьшается до нескольких ширин и
+перекодируется в WebP и JPEG. Варианты сохраняются заново из пикселей,
+поэтому EXIF, GPS и прочие метаданные оригинала в них не попадают.
+Пути к вариантам записываются в ``Recipe.image_variants``; пока их нет,
+клиенты показывают оригинал. Варианты называются по хешу исходника (см.
+ContentAddressedStorage.save_derived), поэтому рецепты с одной картинкой
+делят и её копии, а повторная обработка их не перекодирует.
+
+Обработка идёт в пуле потоков после коммита транзакции и не задерживает
+ответ API. Pillow отпускает GIL на время ресайза и кодирования, так что
+потоков достаточно.
+"""
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import connection, transaction
+from django.dispatch import Signal
+from PIL import Image, ImageOps, features
+
+from .models import Recipe
+from .storage import image_storage
+
+logger = logging.getLogger(__name__)
+
+# Ширина вариантов в пикселях. Картинки меньше ширины не увеличиваются.
+SIZES = {
+    'small': 320,
+    'medium': 640,
+    'large': 1280,
+}
+FORMATS = {
+    'webp': ('WEBP', {'quality': 80, 'method': 4}),
+    'jpeg': ('JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+EXTENSIONS = {
+    'webp': 'webp',
+    'jpeg': 'jpg',
+}
+# Pillow без libwebp не умеет WebP, тогда остаётся только JPEG.
+if not features.check('webp'):
+    del EXTENSIONS['webp']
+# Варианты картинки рецепта сохранены; sender — Recipe, аргумент
+# recipe_id. Пути пишутся через update(), который post_save не шлёт.
+variants_saved = Signal()
+
+_executor = None
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.IMAGE_WORKERS,
+            thread_name_prefix='recipe-images',
+        )
+    return _executor
+
+
+def needs_processing(recipe):
+    return bool(recipe.image) and (
+        recipe.image_variants.get('source') != recipe.image.name
+    )
+
+
+def schedule(recipe_id):
+    get_executor().submit(run_in_thread, recipe_id)
+
+
+def run_in_thread(recipe_id):
+    try:
+        process(recipe_id)
+    except Exception:
+        logger.exception(
+            'Не удалось обработать картинку рецепта %s.', recipe_id
+        )
+    finally:
+        # У каждого потока своё соединение с БД, его нужно закрыть.
+        connection.close()
+
+
+def flatten(image):
+    """Приводит картинку к RGB, подкладывая белый фон под прозрачность."""
+    if image.mode in ('RGBA', 'LA', 'P'):
+        image = image.convert('RGBA')
+        background = Image.new('RGB', image.size, 'white')
+        background.paste(image, mask=image.getchannel('A'))
+        return background
+    return image.convert('RGB')
+
+
+def encode(image, variant):
+    image_format, options = FORMATS[variant]
+    buffer = BytesIO()
+    image.save(buffer, image_format, **options)
+    return ContentFile(buffer.getvalue())
+
+
+def process(recipe_id, rebuild=False):
+    """Строит варианты картинки рецепта и сохраняет их пути.
+
+    Уже построенные по этому исходнику копии используются повторно, а с
+    rebuild строятся и перезаписываются заново.
+    """
+    recipe = Recipe.objects.filter(pk=recipe_id).only(
+        'image', 'image_variants'
+    ).first()
+    if recipe is None or not recipe.image:
+        return
+    source = recipe.image.name
+    previous = recipe.image_variants
+    digest = image_storage.digest(source)
+    names = {
+        size: {
+            variant: image_storage.derived_name(
+                digest, f'{size}.{extension}'
+            )
+            for variant, extension in EXTENSIONS.items()
+        }
+        for size in SIZES
+    }
+    if rebuild or not all(
+        image_storage.exists(name)
+        for formats in names.values() for name in formats.values()
+    ):
+        save_variants(recipe, digest, overwrite=rebuild)
+    updated = Recipe.objects.filter(pk=recipe_id, image=source).update(
+        image_variants={'source': source, 'sizes': names},
+        **Recipe.touched(),
+    )
+    if not updated:
+        # Картинку успели заменить; копии нужны, только если исходник
+        # остался у других рецептов.
+        with transaction.atomic():
+            image_storage.lock(source)
+            if not Recipe.objects.filter(image=source).exists():
+                image_storage.delete_derived(digest)
+    else:
+        delete_variants(previous)
+        variants_saved.send(sender=Recipe, recipe_id=recipe_id)
+
+
+def save_variants(recipe, digest, overwrite=False):
+    with recipe.image.open('rb') as file, Image.open(file) as original:
+        image = flatten(ImageOps.exif_transpose(original))
+    for size, width in SIZES.items():
+        resized = image
+        if image.width > width:
+            height = round(image.height * width / image.width)
+            resized = image.resize(
+                (width, height), Image.Resampling.LANCZOS
+            )
+        for variant, extension in EXTENSIONS.items():
+            image_storage.save_derived(
+                digest, f'{size}.{extension}', encode(resized, variant),
+                overwrite=overwrite,
+            )
+
+
+def delete_variants(variants):
+    """Удаляет копии, построенные по старой схеме имён, отдельно для рецепта.
+
+    Копии по хешу исходника общие и удаляются вместе с ним.
+    """
+    for formats in variants.get('sizes', {}).values():
+        for name in formats.values():
+            if not image_storage.is_derived(name):
+                image_storage.delete(name)
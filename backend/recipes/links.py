@@ -0,0 +1,112 @@
+"""Добавление и удаление связей пользователя без гонки проверки.
+
+Связь вставляется запросом с пропуском конфликта по уникальности и
+удаляется условным DELETE, а RETURNING возвращает только те связи,
+которые запрос действительно добавил или удалил. Повторный клик поэтому
+не упирается в уникальное ограничение и не требует отдельной проверки
+exists(), а связь, изменённая параллельным запросом, не учитывается
+дважды.
+
+Такие запросы не шлют post_save и post_delete по строкам, поэтому все
+изменения связей — одиночные, пакетные и через ORM — сообщают о себе
+одним сигналом links_changed. Счётчики, лента подписок, список покупок
+и кеши обновляются его приёмниками (см. recipes.signals и
+api.v1.signals).
+"""
+from django.db import connections, router, transaction
+from django.db.models.sql import InsertQuery
+from django.dispatch import Signal
+
+from .models import FavoriteRecipe, ShoppingCart, Subscribe
+from .sql import column, table
+
+# Связь -> (поле пользователя, поле объекта связи).
+FIELDS = {
+    FavoriteRecipe: ('author', 'recipe'),
+    ShoppingCart: ('author', 'recipe'),
+    Subscribe: ('user', 'author'),
+}
+
+# sender — модель связи; аргументы user_id, target_ids и created
+# (True — связи добавлены, False — удалены).
+links_changed = Signal()
+
+
+def changed(model, user_id, target_ids, created):
+    links_changed.send(
+        sender=model, user_id=user_id,
+        target_ids=list(target_ids), created=created,
+    )
+
+
+def insert(model, user_id, target_ids):
+    """INSERT, пропускающий конфликты; возвращает id добавленных объектов."""
+    user_field, field = FIELDS[model]
+    using = router.db_for_write(model)
+    connection = connections[using]
+    objs = [
+        model(**{f'{user_field}_id': user_id, f'{field}_id': target_id})
+        for target_id in target_ids
+    ]
+    fields = [
+        model_field for model_field in model._meta.concrete_fields
+        if model_field is not model._meta.auto_field
+    ]
+    query = InsertQuery(model, ignore_conflicts=True)
+    query.insert_values(fields, objs)
+    inserted = []
+    with connection.cursor() as cursor:
+        for sql, params in query.get_compiler(using).as_sql():
+            cursor.execute(
+                f'{sql} RETURNING {column(model, field, connection)}', params
+            )
+            inserted.extend(row[0] for row in cursor.fetchall())
+    return inserted
+
+
+def delete(model, user_id, target_ids):
+    """Удаляет связи одним DELETE; возвращает id объектов удалённых связей.
+
+    QuerySet.delete() сначала загрузил бы строки ради сигналов
+    post_delete.
+    """
+    user_field, field = FIELDS[model]
+    connection = connections[router.db_for_write(model)]
+    sql = 'DELETE FROM {} WHERE {} = %s AND {} IN ({}) RETURNING {}'.format(
+        table(model, connection),
+        column(model, user_field, connection),
+        column(model, field, connection),
+        ', '.join(['%s'] * len(target_ids)),
+        column(model, field, connection),
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [user_id, *target_ids])
+        return [row[0] for row in cursor.fetchall()]
+
+
+@transaction.atomic(savepoint=False)
+def link(model, user_id, target_id):
+    """Создаёт связь; возвращает False, если она уже была.
+
+    Связь и производные данные из приёмников links_changed фиксируются
+    одной транзакцией: ошибка приёмника откатывает и саму связь. Внутри
+    уже открытой транзакции точка сохранения не нужна: ошибка всё равно
+    прерывает её целиком.
+    """
+    if not insert(model, user_id, [target_id]):
+        return False
+    changed(model, user_id, [target_id], created=True)
+    return True
+
+
+@transaction.atomic(savepoint=False)
+def unlink(model, user_id, target_id):
+    """Удаляет связь; возвращает False, если её не было (см. link)."""
+    # id объекта может прийти строкой из URL.
+    target_id = model._meta.get_field(FIELDS[model][1]).get_prep_value(
+        target_id
+    )
+    if not delete(model, user_id, [target_id]):
+        return False
+    changed(model, user_id, [target_id], created=False)
+    return True
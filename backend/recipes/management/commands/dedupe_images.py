@@ -0,0 +1,47 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from recipes.images import variants_saved
+from recipes.models import Recipe
+from recipes.storage import image_storage
+
+
+class Command(BaseCommand):
+    help = (
+        'Перенос загруженных ранее картинок рецептов в хранилище '
+        'с адресацией по содержимому'
+    )
+
+    def handle(self, **options):
+        moved = missing = 0
+        names = Recipe.objects.exclude(image='').order_by().values_list(
+            'image', flat=True
+        ).distinct()
+        for name in list(names):
+            if image_storage.is_content_addressed(name):
+                continue
+            if not image_storage.exists(name):
+                missing += 1
+                self.stderr.write(f'Файл не найден: {name}')
+                continue
+            # Байты переносятся как есть, картинка не перекодируется.
+            with image_storage.open(name) as file:
+                stored = image_storage.save(name, file)
+            with transaction.atomic():
+                for recipe in Recipe.objects.filter(image=name).only(
+                    'image_variants'
+                ):
+                    variants = recipe.image_variants
+                    if variants.get('source') == name:
+                        variants['source'] = stored
+                    # Новая версия сбрасывает ETag и фрагменты со старым
+                    # адресом картинки.
+                    Recipe.objects.filter(pk=recipe.pk).update(
+                        image=stored, image_variants=variants,
+                        **Recipe.touched(),
+                    )
+                    variants_saved.send(sender=Recipe, recipe_id=recipe.pk)
+            image_storage.delete(name)
+            moved += 1
+        self.stdout.write(self.style.SUCCESS(
+            f'Перенесено картинок: {moved}, не найдено: {missing}.'
+        ))
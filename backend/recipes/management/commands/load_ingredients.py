@@ -1,26 +1,135 @@
 import csv
+import json
+import os
+import re
 
 from django.conf import settings
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
 from recipes.models import Ingredient
+from recipes.sql import chunks, column, table
+
+JSON_BLOCK_SIZE = 64 * 1024
+JSON_SEPARATOR = re.compile(r'[\s,]*')
+
+# Уже загруженные ингредиенты не меняются: их единица измерения
+# относится к количествам во всех сохранённых рецептах.
+SKIP_CONFLICTS = 'ON CONFLICT DO NOTHING'
+
+
+def read_csv(file):
+    for row in csv.reader(file, delimiter=','):
+        if row:
+            yield row[0], row[1]
+
+
+def read_json(file):
+    """Потоково читает JSON-массив объектов, не загружая файл целиком."""
+    decoder = json.JSONDecoder()
+    buffer = file.read(JSON_BLOCK_SIZE).lstrip()
+    if not buffer.startswith('['):
+        raise CommandError('Ожидался JSON-массив ингредиентов.')
+    position = 1
+    while True:
+        position = JSON_SEPARATOR.match(buffer, position).end()
+        if buffer.startswith(']', position):
+            return
+        try:
+            item, position = decoder.raw_decode(buffer, position)
+        except json.JSONDecodeError:
+            block = file.read(JSON_BLOCK_SIZE)
+            if not block:
+                raise CommandError('Некорректный JSON в файле ингредиентов.')
+            buffer, position = buffer[position:] + block, 0
+            continue
+        yield item['name'], item['measurement_unit']
+
+
+READERS = {
+    'csv': read_csv,
+    'json': read_json,
+}
 
 
 class Command(BaseCommand):
-    help = 'Загрузка ингредиентов в БД из .csv'
-
-    def handle(self, **kwargs):
-        data_path = settings.BASE_DIR
-        with open(
-            f'{data_path}/data/ingredients.csv',
-            'r',
-            encoding='UTF-8'
-        ) as file:
-            reader = csv.reader(file, delimiter=',')
-            for row in reader:
-                Ingredient.objects.get_or_create(
-                    name=row[0],
-                    measurement_unit=row[1]
-                )
+    help = 'Загрузка ингредиентов в БД из .csv или .json'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--path',
+            default=os.path.join(settings.BASE_DIR, 'data', 'ingredients.csv'),
+            help='Путь к файлу с ингредиентами.'
+        )
+        parser.add_argument(
+            '--format',
+            choices=READERS,
+            help='Формат файла; по умолчанию определяется по расширению.'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Количество строк, обрабатываемых за один запрос.'
+        )
+
+    def handle(self, **options):
+        path = options['path']
+        file_format = options['format'] or os.path.splitext(path)[1][1:]
+        if file_format not in READERS:
+            raise CommandError(f'Неизвестный формат файла: {path}')
+        self.inserted = self.skipped = 0
+        with open(path, 'r', encoding='UTF-8') as file:
+            with transaction.atomic():
+                for chunk in chunks(
+                    READERS[file_format](file), options['batch_size']
+                ):
+                    self.load_chunk(chunk)
         self.stdout.write(self.style.SUCCESS(
-                          'Ингредиенты успешно загружены в БД.'
-                          ))
+            'Ингредиенты успешно загружены в БД. '
+            f'Добавлено: {self.inserted}, '
+            f'пропущено: {self.skipped}.'
+        ))
+
+    def load_chunk(self, chunk):
+        # Из повторов внутри файла остаётся первое вхождение: в пачке
+        # его сохраняет словарь, между пачками — пропуск конфликтов.
+        rows = {}
+        for name, measurement_unit in chunk:
+            rows.setdefault(name.strip(), measurement_unit.strip())
+        inserted = self.insert(list(rows.items()))
+        self.inserted += inserted
+        self.skipped += len(chunk) - inserted
+
+    # Запросы собираются вручную: на миллионах строк подготовка
+    # параметров в ORM обходится дороже самих запросов.
+    FIELDS = (
+        Ingredient._meta.get_field('name'),
+        Ingredient._meta.get_field('measurement_unit'),
+    )
+
+    @classmethod
+    def insert(cls, rows):
+        """Пишет строки многострочными INSERT пачками, допустимыми для БД.
+
+        Возвращает число действительно добавленных строк.
+        """
+        if not rows:
+            return 0
+        sql = (
+            'INSERT INTO {table} ({name}, {measurement_unit}) VALUES '
+        ).format(
+            table=table(Ingredient),
+            name=column(Ingredient, 'name'),
+            measurement_unit=column(Ingredient, 'measurement_unit'),
+        )
+        batch_size = connection.ops.bulk_batch_size(cls.FIELDS, rows)
+        inserted = 0
+        with connection.cursor() as cursor:
+            for batch in chunks(rows, batch_size):
+                cursor.execute(
+                    sql + ', '.join(['(%s, %s)'] * len(batch))
+                    + ' ' + SKIP_CONFLICTS,
+                    [value for row in batch for value in row]
+                )
+                inserted += cursor.rowcount
+        return inserted
@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+from recipes import images
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    help = 'Построение уменьшенных копий картинок рецептов'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            help=(
+                'Пересобрать и перезаписать копии всех рецептов, в том '
+                'числе уже обработанных.'
+            )
+        )
+
+    def handle(self, **options):
+        processed = failed = 0
+        recipes = Recipe.objects.only('image', 'image_variants').order_by()
+        for recipe in recipes.iterator():
+            if not options['all'] and not images.needs_processing(recipe):
+                continue
+            try:
+                images.process(recipe.pk, rebuild=options['all'])
+            except Exception as error:
+                failed += 1
+                self.stderr.write(f'Рецепт {recipe.pk}: {error}')
+            else:
+                processed += 1
+        self.stdout.write(self.style.SUCCESS(
+            f'Картинки обработаны: {processed}, с ошибкой: {failed}.'
+        ))
@@ -0,0 +1,26 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from recipes.counters import count
+from recipes.models import FavoriteRecipe, Recipe, ShoppingCart, Subscribe
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Пересчёт счётчиков избранного, покупок, подписчиков и рецептов'
+
+    @transaction.atomic
+    def handle(self, **options):
+        recipes = Recipe.objects.update(
+            favorites_count=count(FavoriteRecipe, 'recipe'),
+            shopping_cart_count=count(ShoppingCart, 'recipe'),
+        )
+        users = User.objects.update(
+            recipes_count=count(Recipe, 'author'),
+            subscribers_count=count(Subscribe, 'author'),
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Счётчики пересчитаны. Рецептов: {recipes}, '
+            f'пользователей: {users}.'
+        ))
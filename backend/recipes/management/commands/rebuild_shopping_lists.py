@@ -0,0 +1,61 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Sum
+from recipes import shopping_list
+from recipes.models import ShoppingCart, ShoppingListItem
+
+
+def expected_items():
+    """Суммы ингредиентов по корзинам: {(пользователь, ингредиент): сумма}."""
+    totals = ShoppingCart.objects.values_list(
+        'author_id', 'recipe__recipe__ingredient_id'
+    ).annotate(
+        total=Sum('recipe__recipe__amount')
+    ).filter(total__gt=0).order_by()
+    return {
+        (user_id, ingredient_id): total
+        for user_id, ingredient_id, total in totals.iterator()
+    }
+
+
+def stored_items():
+    items = ShoppingListItem.objects.values_list(
+        'user_id', 'ingredient_id', 'amount'
+    )
+    return {
+        (user_id, ingredient_id): amount
+        for user_id, ingredient_id, amount in items.iterator()
+    }
+
+
+class Command(BaseCommand):
+    help = 'Проверка и пересборка списков покупок из корзин'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help='Только сверить списки с корзинами, ничего не меняя.'
+        )
+
+    def handle(self, **options):
+        expected, stored = expected_items(), stored_items()
+        broken = {
+            user_id for (user_id, _), _ in expected.items() ^ stored.items()
+        }
+        if options['check']:
+            if broken:
+                raise CommandError(
+                    f'Списки покупок расходятся с корзинами у '
+                    f'{len(broken)} пользователей.'
+                )
+            self.stdout.write(self.style.SUCCESS(
+                'Списки покупок совпадают с корзинами.'
+            ))
+            return
+        with transaction.atomic():
+            shopping_list.rebuild()
+        self.stdout.write(self.style.SUCCESS(
+            f'Списки покупок пересобраны. Исправлено расхождений у '
+            f'{len(broken)} пользователей.'
+        ))
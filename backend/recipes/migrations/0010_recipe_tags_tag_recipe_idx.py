@@ -0,0 +1,21 @@
+from django.db import migrations
+
+# Таблица связи рецептов и тегов создаётся Django автоматически, поэтому
+# составной индекс (tag_id, recipe_id) для фильтра по тегам добавляется
+# SQL-запросом: у неё нет Meta, куда его можно было бы объявить.
+INDEX = 'recipe_tags_tag_recipe_idx'
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0009_shopping_list'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            f'CREATE INDEX {INDEX} '
+            'ON recipes_recipe_tags (tag_id, recipe_id)',
+            f'DROP INDEX {INDEX}',
+        ),
+    ]
@@ -1,10 +1,15 @@
 from colorfield.fields import ColorField
 from django.contrib.auth import get_user_model
+from django.contrib.postgres.search import SearchVectorField
 from django.core.validators import MinValueValidator
-from django.db.models import (CASCADE, CharField, DateTimeField, ForeignKey,
-                              ImageField, ManyToManyField, Model,
+from django.db.models import (CASCADE, CharField, DateTimeField, F, ForeignKey,
+                              ImageField, Index, IntegerField, JSONField,
+                              ManyToManyField, Model, PositiveIntegerField,
                               PositiveSmallIntegerField, SlugField, TextField,
                               UniqueConstraint)
+from django.utils import timezone
+
+from .storage import image_storage
 
 User = get_user_model()
 
@@ -77,8 +82,15 @@ class Recipe(Model):
     image = ImageField(
         'Картинка',
         upload_to='recipes/',
+        storage=image_storage,
+        db_index=True,
         help_text='Загрузите картинку',
     )
+    image_variants = JSONField(
+        'Уменьшенные копии картинки',
+        default=dict,
+        editable=False
+    )
     text = TextField('Описание рецепта')
     ingredients = ManyToManyField(
         Ingredient,
@@ -101,6 +113,30 @@ class Recipe(Model):
         'Дата публикации',
         auto_now_add=True
     )
+    updated_at = DateTimeField(
+        'Дата изменения',
+        auto_now=True
+    )
+    version = PositiveIntegerField(
+        'Версия',
+        default=1,
+        editable=False
+    )
+    favorites_count = PositiveIntegerField(
+        'В избранном',
+        default=0,
+        editable=False
+    )
+    shopping_cart_count = PositiveIntegerField(
+        'В списках покупок',
+        default=0,
+        editable=False
+    )
+    search_vector = SearchVectorField(
+        'Поисковый вектор',
+        null=True,
+        editable=False
+    )
 
     class Meta:
         ordering = ['-pub_date']
@@ -112,10 +148,39 @@ class Recipe(Model):
                 name='unique_recipe',
             ),
         )
+        indexes = (
+            Index(
+                fields=('-pub_date', '-id'),
+                name='recipe_pub_date_id_idx',
+            ),
+        )
 
     def __str__(self):
         return f'{self.name}'
 
+    @staticmethod
+    def touched():
+        """Значения для update(), отмечающие изменение рецептов.
+
+        Версия и дата изменения служат валидаторами условных GET-запросов
+        и ключом кеша представлений рецепта.
+        """
+        return {'version': F('version') + 1, 'updated_at': timezone.now()}
+
+    def save_edited(self):
+        """Сохраняет правку рецепта и поднимает его версию.
+
+        Пишутся только редактируемые поля: счётчики, уменьшенные копии
+        картинки и поисковый вектор меняются своими update(), и полный
+        save() вернул бы им устаревшие значения из памяти.
+        """
+        self.version = F('version') + 1
+        self.save(update_fields=[
+            field.name for field in self._meta.concrete_fields
+            if field.editable and not field.primary_key
+        ] + ['version', 'updated_at'])
+        self.refresh_from_db(fields=('version',))
+
 
 class IngredientInRecipe(Model):
     amount = PositiveSmallIntegerField(
@@ -177,6 +242,10 @@ class Subscribe(Model):
             UniqueConstraint(
                 fields=['user', 'author'],
                 name='unique_subscription')]
+        indexes = [
+            Index(
+                fields=['user', '-pub_date', '-id'],
+                name='subscribe_user_pub_date_idx')]
 
     def __str__(self):
         return f'{self.author}'
@@ -238,3 +307,90 @@ class ShoppingCart(Model):
     def __str__(self):
         recipe = [item['name'] for item in self.recipe.values('name')]
         return f'{recipe}'
+
+
+class TimelineEntry(Model):
+    """Рецепт в ленте подписок пользователя.
+
+    Строки создаются при публикации рецепта для всех подписчиков автора
+    и при подписке для всех рецептов автора. Дата публикации копируется
+    из рецепта, чтобы лента читалась по индексу без соединения таблиц.
+    """
+    user = ForeignKey(
+        User,
+        on_delete=CASCADE,
+        related_name='timeline',
+        verbose_name='Читатель',
+    )
+    recipe = ForeignKey(
+        Recipe,
+        on_delete=CASCADE,
+        related_name='timeline_entries',
+        verbose_name='Рецепт',
+    )
+    author = ForeignKey(
+        User,
+        on_delete=CASCADE,
+        related_name='+',
+        verbose_name='Автор рецепта',
+    )
+    pub_date = DateTimeField('Дата публикации рецепта')
+
+    class Meta:
+        ordering = ['-pub_date', '-id']
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Лента подписок'
+        constraints = (
+            UniqueConstraint(
+                fields=('user', 'recipe'),
+                name='unique_timeline_entry',
+            ),
+        )
+        indexes = (
+            Index(
+                fields=('user', '-pub_date', '-id'),
+                name='timeline_user_pub_date_idx',
+            ),
+            Index(
+                fields=('user', 'author'),
+                name='timeline_user_author_idx',
+            ),
+        )
+
+    def __str__(self):
+        return f'{self.user}: {self.recipe}'
+
+
+class ShoppingListItem(Model):
+    """Сумма ингредиента по всем рецептам из списка покупок пользователя.
+
+    Поддерживается приращениями при изменении корзины и ингредиентов
+    рецептов (см. shopping_list), пересобирается командой
+    rebuild_shopping_lists.
+    """
+    user = ForeignKey(
+        User,
+        on_delete=CASCADE,
+        related_name='shopping_list',
+        verbose_name='Владелец списка покупок',
+    )
+    ingredient = ForeignKey(
+        Ingredient,
+        on_delete=CASCADE,
+        related_name='+',
+        verbose_name='Ингредиент',
+    )
+    amount = IntegerField('Количество')
+
+    class Meta:
+        verbose_name = 'Строка списка покупок'
+        verbose_name_plural = 'Строки списков покупок'
+        constraints = (
+            UniqueConstraint(
+                fields=('user', 'ingredient'),
+                name='unique_shopping_list_item',
+            ),
+        )
+
+    def __str__(self):
+        return f'{self.user}: {self.ingredient_id} - {self.amount}'
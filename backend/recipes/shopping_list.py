@@ -0,0 +1,176 @@
+"""Списки покупок, поддерживаемые приращениями.
+
+ShoppingListItem хранит сумму каждого ингредиента по всем рецептам из
+корзины пользователя, поэтому выгрузка списка читает готовые строки по
+индексу (user, ingredient). Приращение считается одним запросом
+INSERT ... SELECT ... ON CONFLICT DO UPDATE прямо из IngredientInRecipe,
+строки с нулевой суммой удаляются.
+
+* add и remove — рецепты добавлены в корзину пользователя или убраны из
+  неё;
+* retract и restore обрамляют изменение ингредиентов рецептов: вклад
+  рецептов вычитается из списков всех, у кого они в корзине, и после
+  изменения добавляется заново. Вместе их вызывает editing в одной
+  транзакции.
+
+Каждое приращение сначала блокирует строки своих рецептов до конца
+транзакции. Поэтому добавление рецепта в корзину или удаление из неё
+ждёт, пока правка ингредиентов между retract и restore не завершится, и
+вклад рецепта не учитывается дважды.
+
+Любое расхождение исправляет команда rebuild_shopping_lists.
+"""
+from contextlib import contextmanager
+
+from django.db import connection, transaction
+from django.db.models import F
+
+from .models import IngredientInRecipe, Recipe, ShoppingCart, ShoppingListItem
+from .sql import column, table
+
+UPSERT = (
+    'INSERT INTO {items} ({user}, {ingredient}, {amount}) '
+    'SELECT {owner}, ir.{row_ingredient}, %s * SUM(ir.{row_amount}) '
+    'FROM {rows} ir {join}'
+    'WHERE ir.{row_recipe} IN ({recipes}) '
+    'GROUP BY {group} '
+    'ON CONFLICT ({user}, {ingredient}) DO UPDATE '
+    'SET {amount} = {items}.{amount} + EXCLUDED.{amount}'
+)
+REBUILD = (
+    'INSERT INTO {items} ({user}, {ingredient}, {amount}) '
+    'SELECT cart.{cart_user}, ir.{row_ingredient}, SUM(ir.{row_amount}) '
+    'FROM {rows} ir JOIN {cart} cart '
+    'ON cart.{cart_recipe} = ir.{row_recipe} '
+    '{where}'
+    'GROUP BY cart.{cart_user}, ir.{row_ingredient}'
+)
+
+
+def columns():
+    return {
+        'items': table(ShoppingListItem),
+        'user': column(ShoppingListItem, 'user'),
+        'ingredient': column(ShoppingListItem, 'ingredient'),
+        'amount': column(ShoppingListItem, 'amount'),
+        'rows': table(IngredientInRecipe),
+        'row_recipe': column(IngredientInRecipe, 'recipe'),
+        'row_ingredient': column(IngredientInRecipe, 'ingredient'),
+        'row_amount': column(IngredientInRecipe, 'amount'),
+        'cart': table(ShoppingCart),
+        'cart_user': column(ShoppingCart, 'author'),
+        'cart_recipe': column(ShoppingCart, 'recipe'),
+    }
+
+
+def drop_empty(recipe_ids, **filters):
+    ShoppingListItem.objects.filter(
+        amount__lte=0,
+        ingredient__in=IngredientInRecipe.objects.filter(
+            recipe_id__in=recipe_ids
+        ).values('ingredient'),
+        **filters
+    ).delete()
+
+
+def lock(recipe_ids):
+    """Блокирует строки рецептов до конца текущей транзакции.
+
+    SQLite блокирует базу целиком и SELECT ... FOR UPDATE не знает.
+    """
+    if connection.features.has_select_for_update:
+        list(Recipe.objects.select_for_update().filter(
+            pk__in=recipe_ids
+        ).order_by('pk').values_list('pk', flat=True))
+
+
+@transaction.atomic(savepoint=False)
+def change(recipe_ids, sign, user_id=None):
+    """Прибавляет (sign=1) или вычитает (sign=-1) ингредиенты рецептов.
+
+    С user_id меняется список одного пользователя, без него — списки
+    всех, у кого рецепты лежат в корзине.
+    """
+    recipe_ids = list(recipe_ids)
+    if not recipe_ids:
+        return
+    lock(recipe_ids)
+    names = columns()
+    if user_id is None:
+        params = [sign, *recipe_ids]
+        names.update(
+            owner='cart.{cart_user}'.format(**names),
+            join='JOIN {cart} cart ON cart.{cart_recipe} = ir.{row_recipe} '
+            .format(**names),
+            group='cart.{cart_user}, ir.{row_ingredient}'.format(**names),
+        )
+    else:
+        params = [user_id, sign, *recipe_ids]
+        names.update(
+            owner='%s',
+            join='',
+            group='ir.{row_ingredient}'.format(**names),
+        )
+    names['recipes'] = ', '.join(['%s'] * len(recipe_ids))
+    with connection.cursor() as cursor:
+        cursor.execute(UPSERT.format(**names), params)
+    if sign < 0:
+        if user_id is None:
+            drop_empty(recipe_ids)
+        else:
+            drop_empty(recipe_ids, user_id=user_id)
+
+
+def add(user_id, recipe_ids):
+    change(recipe_ids, 1, user_id)
+
+
+def remove(user_id, recipe_ids):
+    change(recipe_ids, -1, user_id)
+
+
+def retract(recipe_ids):
+    change(recipe_ids, -1)
+
+
+def restore(recipe_ids):
+    change(recipe_ids, 1)
+
+
+@contextmanager
+def editing(recipe_ids):
+    """Обрамляет изменение ингредиентов рецептов retract и restore."""
+    recipe_ids = list(recipe_ids)
+    with transaction.atomic(savepoint=False):
+        retract(recipe_ids)
+        yield
+        restore(recipe_ids)
+
+
+def rebuild(user_ids=None):
+    """Пересобирает списки покупок (всех или user_ids) из корзин."""
+    items = ShoppingListItem.objects.all()
+    names = columns()
+    names['where'] = ''
+    params = []
+    if user_ids is not None:
+        user_ids = list(user_ids)
+        if not user_ids:
+            return
+        items = items.filter(user_id__in=user_ids)
+        names['where'] = 'WHERE cart.{cart_user} IN ({users}) '.format(
+            users=', '.join(['%s'] * len(user_ids)), **names
+        )
+        params = user_ids
+    items.delete()
+    with connection.cursor() as cursor:
+        cursor.execute(REBUILD.format(**names), params)
+
+
+def items_for(user):
+    """Строки списка покупок в формате, который ждёт pdf_generate."""
+    return ShoppingListItem.objects.filter(user=user).values(
+        'amount',
+        name=F('ingredient__name'),
+        measurement_unit=F('ingredient__measurement_unit'),
+    ).order_by('name')
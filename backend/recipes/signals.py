@@ -0,0 +1,292 @@
+import threading
+
+from django.contrib.auth import get_user_model
+from django.contrib.postgres.search import SearchVector
+from django.db import connection, transaction
+from django.db.models import F
+from django.db.models.signals import (m2m_changed, post_delete, post_init,
+                                      post_save, pre_delete, pre_save)
+from django.dispatch import Signal, receiver
+
+from . import images, shopping_list, timeline
+from .counters import COUNTERS, recount
+from .links import FIELDS, changed, links_changed
+from .models import (FavoriteRecipe, Ingredient, IngredientInRecipe, Recipe,
+                     ShoppingCart, Subscribe, Tag)
+from .storage import image_storage
+
+User = get_user_model()
+
+# Название весит больше описания, поэтому совпадение в названии
+# поднимает рецепт выше в выдаче поиска.
+SEARCH_VECTOR = (
+    SearchVector('name', weight='A', config='russian')
+    + SearchVector('text', weight='B', config='russian')
+)
+
+# Объекты, удаляемые в текущем потоке. При каскадном удалении рецепта
+# или пользователя их собственные счётчики обновлять незачем.
+_deleting = threading.local()
+
+
+def deleting():
+    if not hasattr(_deleting, 'objects'):
+        _deleting.objects = set()
+    return _deleting.objects
+
+
+def change_counter(sender, instance, delta):
+    field, model, counter = COUNTERS[sender]
+    pk = getattr(instance, field)
+    if (model, pk) in deleting():
+        return
+    model.objects.filter(pk=pk).update(**{counter: F(counter) + delta})
+
+
+@receiver(post_save, sender=Recipe)
+def update_search_vector(instance, update_fields, **kwargs):
+    """Пересчитывает поисковый вектор рецепта после сохранения.
+
+    Вектор хранится в таблице, чтобы поиск не строил его на каждом
+    запросе. Полнотекстовый поиск есть только в PostgreSQL, на других
+    СУБД поле остаётся пустым.
+    """
+    if connection.vendor != 'postgresql':
+        return
+    if update_fields and not {'name', 'text'} & set(update_fields):
+        return
+    Recipe.objects.filter(pk=instance.pk).update(search_vector=SEARCH_VECTOR)
+
+
+@receiver(pre_delete, sender=Recipe)
+@receiver(pre_delete, sender=User)
+def mark_deleting(sender, instance, **kwargs):
+    deleting().add((sender, instance.pk))
+
+
+@receiver(post_save, sender=Recipe)
+def increment_counter(sender, instance, created, raw, **kwargs):
+    if created and not raw:
+        change_counter(sender, instance, 1)
+
+
+@receiver(post_delete, sender=Recipe)
+@receiver(post_delete, sender=User)
+def decrement_counter(sender, instance, **kwargs):
+    if sender in COUNTERS:
+        change_counter(sender, instance, -1)
+    deleting().discard((sender, instance.pk))
+
+
+# Связи, сохранённые и удалённые через ORM (админка, каскады), сообщают
+# о себе тем же сигналом, что и recipes.links и пакетные операции.
+@receiver(post_save, sender=FavoriteRecipe)
+@receiver(post_save, sender=ShoppingCart)
+@receiver(post_save, sender=Subscribe)
+def link_saved(sender, instance, created, raw, **kwargs):
+    if created and not raw:
+        user_field, field = FIELDS[sender]
+        changed(
+            sender, getattr(instance, f'{user_field}_id'),
+            [getattr(instance, f'{field}_id')], created=True,
+        )
+
+
+@receiver(post_delete, sender=FavoriteRecipe)
+@receiver(post_delete, sender=ShoppingCart)
+@receiver(post_delete, sender=Subscribe)
+def link_deleted(sender, instance, **kwargs):
+    user_field, field = FIELDS[sender]
+    changed(
+        sender, getattr(instance, f'{user_field}_id'),
+        [getattr(instance, f'{field}_id')], created=False,
+    )
+
+
+@receiver(links_changed, sender=FavoriteRecipe)
+@receiver(links_changed, sender=ShoppingCart)
+@receiver(links_changed, sender=Subscribe)
+def recount_links(sender, target_ids, **kwargs):
+    # Счётчики удаляемых объектов обновлять незачем.
+    model = COUNTERS[sender][1]
+    target_ids = [pk for pk in target_ids if (model, pk) not in deleting()]
+    if target_ids:
+        recount(sender, target_ids)
+
+
+@receiver(post_save, sender=Recipe)
+def fan_out_recipe(instance, created, raw, **kwargs):
+    # Раскладка по лентам идёт после коммита, пачками и вне транзакции
+    # запроса, который создал рецепт.
+    if created and not raw:
+        transaction.on_commit(lambda: timeline.fan_out(instance.pk))
+
+
+@receiver(links_changed, sender=Subscribe)
+def update_timeline(user_id, target_ids, created, **kwargs):
+    if created:
+        timeline.backfill(user_id, target_ids)
+        return
+    # Ленты удаляемых пользователей очистит каскад.
+    if (User, user_id) in deleting():
+        return
+    author_ids = [pk for pk in target_ids if (User, pk) not in deleting()]
+    if author_ids:
+        timeline.trim(user_id, author_ids)
+
+
+@receiver(post_save, sender=Recipe)
+def process_image(instance, raw, **kwargs):
+    if not raw and images.needs_processing(instance):
+        transaction.on_commit(lambda: images.schedule(instance.pk))
+
+
+@receiver(post_delete, sender=Recipe)
+def delete_image_variants(instance, **kwargs):
+    images.delete_variants(instance.image_variants)
+
+
+def release_image(name):
+    """Удаляет картинку и её копии, если на неё не ссылается ни один рецепт.
+
+    Файлы общие для рецептов с одинаковой картинкой (см.
+    ContentAddressedStorage), поэтому ссылки пересчитываются по индексу
+    на Recipe.image после коммита, когда изменения уже видны, и под
+    блокировкой файла.
+    """
+    if not name:
+        return
+    with transaction.atomic():
+        image_storage.lock(name)
+        if not Recipe.objects.filter(image=name).exists():
+            image_storage.release(name)
+
+
+@receiver(pre_save, sender=Recipe)
+def remember_previous_image(instance, raw, update_fields, **kwargs):
+    instance.previous_image = None
+    if raw:
+        return
+    if update_fields is not None and 'image' not in update_fields:
+        return
+    if not instance._state.adding:
+        instance.previous_image = Recipe.objects.filter(
+            pk=instance.pk
+        ).values_list('image', flat=True).first()
+    # Новая загрузка блокируется в ContentAddressedStorage.save, а ссылка
+    # на уже лежащий файл — здесь.
+    image = instance.image
+    if (
+        image and image._committed
+        and image.name != instance.previous_image
+        and image_storage.is_content_addressed(image.name)
+    ):
+        image_storage.lock(image.name)
+        if not image_storage.exists(image.name):
+            # Файл удалили после проверки в сериализаторе: ссылка на него
+            # не сохраняется, транзакция откатывается.
+            raise FileNotFoundError(image.name)
+
+
+@receiver(post_save, sender=Recipe)
+def release_previous_image(instance, **kwargs):
+    previous = getattr(instance, 'previous_image', None)
+    if previous and previous != instance.image.name:
+        transaction.on_commit(lambda: release_image(previous))
+
+
+@receiver(post_delete, sender=Recipe)
+def release_deleted_image(instance, **kwargs):
+    name = instance.image.name
+    transaction.on_commit(lambda: release_image(name))
+
+
+# Версия рецепта меняется вместе со всем, что входит в его представление:
+# ингредиентами, тегами и данными автора. Сохранение самого рецепта
+# поднимает версию в RecipeCreateSerializer.update и в админке.
+@receiver(post_save, sender=IngredientInRecipe)
+def touch_recipe_on_ingredient(instance, raw, **kwargs):
+    if not raw:
+        Recipe.objects.filter(pk=instance.recipe_id).update(**Recipe.touched())
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def touch_recipe_on_tags(instance, action, reverse, pk_set, **kwargs):
+    if not reverse:
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            Recipe.objects.filter(pk=instance.pk).update(**Recipe.touched())
+    elif action == 'pre_clear':
+        Recipe.objects.filter(tags=instance).update(**Recipe.touched())
+    elif action in ('post_add', 'post_remove'):
+        Recipe.objects.filter(pk__in=pk_set).update(**Recipe.touched())
+
+
+@receiver(post_save, sender=Tag)
+@receiver(pre_delete, sender=Tag)
+def touch_tag_recipes(instance, created=False, raw=False, **kwargs):
+    if not created and not raw:
+        Recipe.objects.filter(tags=instance).update(**Recipe.touched())
+
+
+@receiver(post_save, sender=Ingredient)
+@receiver(pre_delete, sender=Ingredient)
+def touch_ingredient_recipes(instance, created=False, raw=False, **kwargs):
+    if not created and not raw:
+        Recipe.objects.filter(
+            recipe__ingredient=instance
+        ).update(**Recipe.touched())
+
+
+# Поля автора, которые входят в представление рецепта.
+AUTHOR_FIELDS = ('email', 'username', 'first_name', 'last_name')
+
+# sender — User, аргумент user_id. Отправляется, когда у автора меняются
+# поля AUTHOR_FIELDS; регистрация, вход и смена пароля его не шлют.
+author_changed = Signal()
+
+
+def author_fields(instance):
+    # Через __dict__, чтобы отложенное поле не загружалось запросом.
+    return {field: instance.__dict__.get(field) for field in AUTHOR_FIELDS}
+
+
+@receiver(post_init, sender=User)
+def remember_author_fields(instance, **kwargs):
+    instance._saved_author_fields = author_fields(instance)
+
+
+@receiver(post_save, sender=User)
+def touch_author_recipes(instance, created, raw, update_fields, **kwargs):
+    saved = instance._saved_author_fields
+    current = author_fields(instance)
+    if update_fields is not None:
+        current = {
+            field: value for field, value in current.items()
+            if field in update_fields
+        }
+    instance._saved_author_fields = {**saved, **current}
+    if created or raw:
+        return
+    if all(saved[field] == value for field, value in current.items()):
+        return
+    Recipe.objects.filter(author=instance).update(**Recipe.touched())
+    author_changed.send(sender=User, user_id=instance.pk)
+
+
+@receiver(links_changed, sender=ShoppingCart)
+def update_shopping_list(user_id, target_ids, created, **kwargs):
+    if created:
+        shopping_list.add(user_id, target_ids)
+        return
+    # Списки удаляемых пользователей очистит каскад, а вклад удаляемых
+    # рецептов уже вычел retract_deleted_recipe.
+    if (User, user_id) in deleting():
+        return
+    shopping_list.remove(user_id, [
+        pk for pk in target_ids if (Recipe, pk) not in deleting()
+    ])
+
+
+@receiver(pre_delete, sender=Recipe)
+def retract_deleted_recipe(instance, **kwargs):
+    shopping_list.retract([instance.pk])
@@ -0,0 +1,41 @@
+"""Помощники для запросов, собранных вручную."""
+import hashlib
+from itertools import islice
+
+from django.db import connection
+
+
+def chunks(rows, size):
+    """Разбивает итерируемое на списки не длиннее size."""
+    rows = iter(rows)
+    while True:
+        chunk = list(islice(rows, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def table(model, connection=connection):
+    """Имя таблицы модели в кавычках для SQL."""
+    return connection.ops.quote_name(model._meta.db_table)
+
+
+def column(model, name, connection=connection):
+    """Имя столбца поля name модели в кавычках для SQL."""
+    return connection.ops.quote_name(model._meta.get_field(name).column)
+
+
+def advisory_lock(key):
+    """Блокировка по строке key до конца текущей транзакции.
+
+    В PostgreSQL это pg_advisory_xact_lock. SQLite и так пускает в базу
+    одного писателя, там блокировка не нужна.
+    """
+    if connection.vendor != 'postgresql':
+        return
+    lock_id = int.from_bytes(
+        hashlib.blake2b(key.encode(), digest_size=8).digest(),
+        'big', signed=True,
+    )
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT pg_advisory_xact_lock(%s)', [lock_id])
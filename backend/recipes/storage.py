@@ -0,0 +1,124 @@
+import hashlib
+import os
+import posixpath
+
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+from .sql import advisory_lock
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """Хранилище, в котором имя файла — SHA-256 его содержимого.
+
+    Файл ``recipes/photo.jpg`` сохраняется как ``recipes/ab/ab12….jpg``.
+    Одинаковые картинки записываются на диск один раз, повторная
+    загрузка возвращает имя уже лежащего файла. Файл общий для всех
+    рецептов, которые на него ссылаются, поэтому удалять его можно
+    только когда ссылок не осталось (см. recipes.signals).
+
+    Сохранение файла и проверка ссылок перед удалением берут блокировку
+    по имени файла (lock) до конца транзакции. Ссылку на сохранённый
+    файл нужно записать в той же транзакции: тогда удаление либо
+    увидит её, либо закончится раньше, и файл будет записан заново.
+
+    Производные файлы (уменьшенные копии) называются по хешу исходника:
+    ``recipes/variants/ab/ab12…-small.jpg``. Они общие для всех рецептов
+    с этим исходником и удаляются вместе с ним.
+    """
+
+    derived_dir = 'recipes/variants'
+
+    def save(self, name, content, max_length=None):
+        digest = hashlib.sha256()
+        for chunk in content.chunks():
+            digest.update(chunk)
+        content.seek(0)
+        digest = digest.hexdigest()
+        directory, basename = posixpath.split(name.replace('\\', '/'))
+        extension = os.path.splitext(basename)[1].lower()
+        name = posixpath.join(directory, digest[:2], digest + extension)
+        self.lock(name)
+        if self.exists(name):
+            return name
+        return super().save(name, content, max_length)
+
+    def lock(self, name):
+        """Блокирует файл от удаления до конца текущей транзакции."""
+        advisory_lock(f'{self.location}:{name}')
+
+    def is_content_addressed(self, name):
+        """Проверяет, что имя построено этим хранилищем из хеша."""
+        parts = name.split('/')
+        digest = os.path.splitext(parts[-1])[0]
+        return (
+            len(parts) >= 2
+            and '..' not in parts
+            and '' not in parts
+            and len(digest) == 64
+            and parts[-2] == digest[:2]
+            and all(char in '0123456789abcdef' for char in digest)
+        )
+
+    def digest(self, name):
+        """SHA-256 содержимого файла; у адресованных по хешу — из имени."""
+        if self.is_content_addressed(name):
+            return os.path.splitext(posixpath.basename(name))[0]
+        digest = hashlib.sha256()
+        with self.open(name) as file:
+            for chunk in file.chunks():
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    def derived_name(self, digest, suffix):
+        return posixpath.join(
+            self.derived_dir, digest[:2], f'{digest}-{suffix}'
+        )
+
+    def save_derived(self, digest, suffix, content, overwrite=False):
+        """Сохраняет производный файл.
+
+        Уже лежащий файл перезаписывается только с overwrite, и тогда
+        подменяется атомарно: читатели не видят его отсутствия.
+        """
+        name = self.derived_name(digest, suffix)
+        if self.exists(name) and not overwrite:
+            return name
+        stored = FileSystemStorage.save(self, name, content)
+        if stored == name:
+            return name
+        if overwrite:
+            os.replace(self.path(stored), self.path(name))
+        else:
+            # Параллельная обработка того же исходника успела первой.
+            self.delete(stored)
+        return name
+
+    def is_derived(self, name):
+        parts = name.split('/')
+        digest = parts[-1].split('-', 1)[0]
+        return (
+            '/'.join(parts[:-2]) == self.derived_dir
+            and len(parts[-1]) > 65
+            and self.is_content_addressed(
+                posixpath.join(parts[-2], digest)
+            )
+        )
+
+    def delete_derived(self, digest):
+        directory = posixpath.dirname(self.derived_name(digest, ''))
+        if not self.exists(directory):
+            return
+        for name in self.listdir(directory)[1]:
+            if name.startswith(f'{digest}-'):
+                self.delete(posixpath.join(directory, name))
+
+    def release(self, name):
+        """Удаляет исходник вместе с его производными файлами."""
+        if self.exists(name):
+            self.delete_derived(self.digest(name))
+        self.delete(name)
+
+
+image_storage = ContentAddressedStorage()
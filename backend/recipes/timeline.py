@@ -0,0 +1,59 @@
+"""Заполнение ленты подписок (fan-out on write).
+
+Лента читается одним запросом по индексу (user, pub_date, id), а вся
+работа переносится на запись: публикация рецепта раскладывает его по
+лентам подписчиков, подписка добавляет в ленту рецепты автора, отписка
+их убирает.
+"""
+from .models import Recipe, Subscribe, TimelineEntry
+from .sql import chunks
+
+# Сколько строк ленты создаётся одним INSERT. У популярного автора
+# подписчики читаются и раскладываются пачками, чтобы не держать в
+# памяти и в одной транзакции весь список.
+FANOUT_BATCH_SIZE = 1000
+
+
+def fan_out(recipe_id):
+    """Добавляет рецепт в ленты всех подписчиков его автора."""
+    recipe = Recipe.objects.filter(pk=recipe_id).values(
+        'author_id', 'pub_date'
+    ).first()
+    if recipe is None:
+        return
+    subscribers = Subscribe.objects.filter(
+        author_id=recipe['author_id']
+    ).order_by().values_list('user_id', flat=True)
+    for batch in chunks(subscribers.iterator(), FANOUT_BATCH_SIZE):
+        TimelineEntry.objects.bulk_create(
+            (
+                TimelineEntry(user_id=user_id, recipe_id=recipe_id, **recipe)
+                for user_id in batch
+            ),
+            ignore_conflicts=True,
+        )
+
+
+def backfill(user_id, author_ids):
+    """Добавляет в ленту подписчика все рецепты авторов author_ids."""
+    recipes = Recipe.objects.filter(
+        author_id__in=author_ids
+    ).order_by().values_list('id', 'author_id', 'pub_date')
+    for batch in chunks(recipes.iterator(), FANOUT_BATCH_SIZE):
+        TimelineEntry.objects.bulk_create(
+            (
+                TimelineEntry(
+                    user_id=user_id, recipe_id=recipe_id,
+                    author_id=author_id, pub_date=pub_date,
+                )
+                for recipe_id, author_id, pub_date in batch
+            ),
+            ignore_conflicts=True,
+        )
+
+
+def trim(user_id, author_ids):
+    """Убирает из ленты рецепты авторов, от которых отписались."""
+    TimelineEntry.objects.filter(
+        user_id=user_id, author_id__in=author_ids
+    ).delete()
@@ -0,0 +1,138 @@
+import base64
+from io import BytesIO
+
+from api.v1.autocomplete import ingredient_index
+from api.v1.payload_cache import ingredient_payloads, tag_payloads
+from api.v1.tag_slugs import tag_slugs
+from django.core.cache import cache
+from django.test import TestCase
+from PIL import Image
+from recipes.models import (FavoriteRecipe, Ingredient, IngredientInRecipe,
+                            Recipe, ShoppingCart, Subscribe, Tag)
+from rest_framework.test import APIClient
+from users.models import User
+
+PASSWORD = 'Sup3r-Secret-Pass'
+
+
+def make_image(size=(1, 1), image_format='PNG', color='orange'):
+    buffer = BytesIO()
+    Image.new('RGB', size, color).save(buffer, image_format)
+    return buffer.getvalue()
+
+
+IMAGE = 'data:image/png;base64,' + base64.b64encode(make_image()).decode()
+
+AUTHORS = 5
+RECIPES = 60
+INGREDIENTS = 30
+INGREDIENTS_PER_RECIPE = 6
+TAGS = 3
+
+
+def seed():
+    """Создаёт известный набор данных и возвращает основные объекты."""
+    user = User.objects.create_user(
+        username='reader', email='reader@foodgram.ru', password=PASSWORD,
+        first_name='Читатель', last_name='Рецептов',
+    )
+    authors = [
+        User.objects.create_user(
+            username=f'author{number}', email=f'author{number}@foodgram.ru',
+            password=PASSWORD, first_name='Автор', last_name=str(number),
+        )
+        for number in range(AUTHORS)
+    ]
+    tags = [
+        Tag.objects.create(
+            name=f'Тег {number}', slug=f'tag{number}',
+            color=f'#00000{number}',
+        )
+        for number in range(TAGS)
+    ]
+    Ingredient.objects.bulk_create(
+        Ingredient(name=f'Ингредиент {number}', measurement_unit='г')
+        for number in range(INGREDIENTS)
+    )
+    ingredients = list(Ingredient.objects.all())
+    recipes = []
+    for number in range(RECIPES):
+        recipe = Recipe.objects.create(
+            author=authors[number % AUTHORS],
+            name=f'Рецепт {number}',
+            text='Описание рецепта для проверки.',
+            cooking_time=number + 1,
+            image='recipes/seed.png',
+        )
+        recipe.tags.set(tags[:number % TAGS + 1])
+        IngredientInRecipe.objects.bulk_create(
+            IngredientInRecipe(
+                recipe=recipe,
+                ingredient=ingredients[(number + shift) % INGREDIENTS],
+                amount=shift + 1,
+            )
+            for shift in range(INGREDIENTS_PER_RECIPE)
+        )
+        recipes.append(recipe)
+    own_recipe = Recipe.objects.create(
+        author=user,
+        name='Свой рецепт',
+        text='Описание своего рецепта.',
+        cooking_time=1,
+        image='recipes/seed.png',
+    )
+    own_recipe.tags.set(tags)
+    IngredientInRecipe.objects.bulk_create(
+        IngredientInRecipe(recipe=own_recipe, ingredient=ingredient, amount=5)
+        for ingredient in ingredients[5:15]
+    )
+    FavoriteRecipe.objects.create(author=user, recipe=own_recipe)
+    ShoppingCart.objects.create(author=user, recipe=own_recipe)
+    for author in authors[:3]:
+        Subscribe.objects.create(user=user, author=author)
+    for recipe in recipes[::2]:
+        FavoriteRecipe.objects.create(author=user, recipe=recipe)
+    for recipe in recipes[::3]:
+        ShoppingCart.objects.create(author=user, recipe=recipe)
+    return {
+        'user': user,
+        'authors': authors,
+        'tags': tags,
+        'ingredients': ingredients,
+        'recipes': recipes,
+        'own_recipe': own_recipe,
+    }
+
+
+def clear_caches():
+    """Сбрасывает кеши, которые переживают откат транзакции между тестами.
+
+    Кеш Django (ответы, фрагменты, версии) и кеши в памяти процесса
+    иначе отдали бы тесту данные, собранные в предыдущем.
+    """
+    cache.clear()
+    tag_slugs.invalidate()
+    ingredient_index.invalidate()
+    tag_payloads.invalidate()
+    ingredient_payloads.invalidate()
+
+
+class SeededTestCase(TestCase):
+    """Тест на наборе данных из seed() с клиентом API.
+
+    Клиент авторизован пользователем fixture['user'], если authenticated
+    не сброшен в наследнике.
+    """
+
+    client_class = APIClient
+    authenticated = True
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.fixture = seed()
+
+    def setUp(self):
+        clear_caches()
+        self.user = self.fixture['user']
+        if self.authenticated:
+            self.client.force_authenticate(self.user)
@@ -0,0 +1,86 @@
+"""Автодополнение ингредиентов по индексу в памяти."""
+from api.v1.autocomplete import IngredientIndex, ingredient_index
+from django.test import TestCase
+from django.urls import reverse
+from recipes.models import Ingredient, IngredientInRecipe, Recipe
+from rest_framework.test import APIClient
+from users.models import User
+
+NAMES = (
+    'Сахар', 'Сахарная пудра', 'Сайра', 'Сардельки', 'Сардины',
+    'Соль', 'Соевый соус', 'Ёжевика',
+)
+
+
+class IngredientIndexTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        Ingredient.objects.bulk_create(
+            Ingredient(name=name, measurement_unit='г') for name in NAMES
+        )
+        author = User.objects.create_user(
+            username='cook', email='cook@foodgram.ru', password='x',
+        )
+        # «Соевый соус» встречается в рецептах чаще «Соли».
+        for number in range(2):
+            recipe = Recipe.objects.create(
+                author=author, name=f'Рецепт {number}', text='.',
+                cooking_time=1, image='recipes/seed.png',
+            )
+            IngredientInRecipe.objects.create(
+                recipe=recipe, amount=1,
+                ingredient=Ingredient.objects.get(name='Соевый соус'),
+            )
+
+    def setUp(self):
+        self.index = IngredientIndex()
+
+    def names(self, query):
+        return [item['name'] for item in self.index.search(query)]
+
+    def test_prefix_before_typos(self):
+        # Совпадений по префиксу мало, за ними идут варианты с опечаткой.
+        self.assertEqual(
+            self.names('сах')[:2], ['Сахар', 'Сахарная пудра']
+        )
+        self.assertIn('Сайра', self.names('сах')[2:])
+        self.assertEqual(self.names('  САХАРН ')[0], 'Сахарная пудра')
+        self.assertEqual(self.names('еж'), ['Ёжевика'])
+
+    def test_popularity(self):
+        self.assertEqual(self.names('со'), ['Соевый соус', 'Соль'])
+
+    def test_typo_ranked_by_edit(self):
+        self.assertEqual(self.names('сахр')[0], 'Сахар')
+        self.assertEqual(self.names('сарйа')[0], 'Сайра')
+        self.assertEqual(self.names('кфыв'), [])
+
+    def test_short_query_without_typos(self):
+        self.assertEqual(self.names('сй'), [])
+
+    def test_invalidate(self):
+        self.assertEqual(self.names('мед'), [])
+        Ingredient.objects.create(name='Мёд', measurement_unit='г')
+        self.assertEqual(self.names('мед'), [])
+        self.index.invalidate()
+        self.assertEqual(self.names('мед'), ['Мёд'])
+
+    def test_warm_up(self):
+        self.index.warm_up()
+        with self.assertNumQueries(0):
+            self.index.search('сах')
+
+
+class IngredientAutocompleteTest(TestCase):
+
+    def test_signals_invalidate_shared_index(self):
+        url = reverse('api:api:ingredients-list')
+        client = APIClient()
+        ingredient_index.invalidate()
+        self.assertEqual(client.get(url, {'name': 'мёд'}).data, [])
+        Ingredient.objects.create(name='Мёд', measurement_unit='г')
+        self.assertEqual(
+            [item['name'] for item in client.get(url, {'name': 'мёд'}).data],
+            ['Мёд'],
+        )
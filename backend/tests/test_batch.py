@@ -0,0 +1,131 @@
+"""Пакетное добавление и удаление избранного, покупок и подписок."""
+from unittest import mock
+
+from api.v1 import batch
+from django.urls import reverse
+from recipes import shopping_list
+from recipes.models import (FavoriteRecipe, Recipe, ShoppingCart,
+                            ShoppingListItem, Subscribe, TimelineEntry)
+
+from .fixtures import SeededTestCase
+
+
+class BatchTest(SeededTestCase):
+
+    def statuses(self, response):
+        return {item['id']: item['status'] for item in response.data}
+
+    def test_favorite_batch(self):
+        url = reverse('api:api:recipes-favorite-batch')
+        favorited, fresh = self.fixture['recipes'][:2]
+        missing = Recipe.objects.latest('pk').pk + 1
+        response = self.client.post(
+            url, {'ids': [fresh.pk, favorited.pk, missing, fresh.pk]},
+            format='json',
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            self.statuses(response),
+            {fresh.pk: 201, favorited.pk: 400, missing: 404},
+        )
+        self.assertTrue(FavoriteRecipe.objects.filter(
+            author=self.user, recipe=fresh
+        ).exists())
+        self.assertEqual(Recipe.objects.get(pk=fresh.pk).favorites_count, 1)
+        response = self.client.delete(
+            url, {'ids': [fresh.pk, favorited.pk]}, format='json'
+        )
+        self.assertEqual(
+            self.statuses(response), {fresh.pk: 204, favorited.pk: 204}
+        )
+        self.assertFalse(FavoriteRecipe.objects.filter(
+            author=self.user, recipe__in=[fresh, favorited]
+        ).exists())
+        self.assertEqual(Recipe.objects.get(pk=fresh.pk).favorites_count, 0)
+        response = self.client.delete(url, {'ids': [fresh.pk]}, format='json')
+        self.assertEqual(self.statuses(response), {fresh.pk: 400})
+
+    def test_subscribe_batch(self):
+        url = reverse('api:api:users-subscribe-batch')
+        authors = self.fixture['authors']
+        response = self.client.post(
+            url, {'ids': [authors[-1].pk, authors[0].pk, self.user.pk]},
+            format='json',
+        )
+        self.assertEqual(self.statuses(response), {
+            authors[-1].pk: 201, authors[0].pk: 400, self.user.pk: 400,
+        })
+        authors[-1].refresh_from_db()
+        self.assertEqual(authors[-1].subscribers_count, 1)
+        self.assertEqual(
+            TimelineEntry.objects.filter(
+                user=self.user, author=authors[-1]
+            ).count(),
+            authors[-1].recipe.count(),
+        )
+        self.client.delete(url, {'ids': [authors[-1].pk]}, format='json')
+        self.assertFalse(Subscribe.objects.filter(
+            user=self.user, author=authors[-1]
+        ).exists())
+        self.assertFalse(TimelineEntry.objects.filter(
+            user=self.user, author=authors[-1]
+        ).exists())
+
+    def test_invalid_payload(self):
+        url = reverse('api:api:recipes-shopping-cart-batch')
+        self.assertEqual(
+            self.client.post(url, {'ids': []}, format='json').status_code, 400
+        )
+        self.assertEqual(
+            self.client.post(url, {'ids': ['x']}, format='json').status_code,
+            400,
+        )
+
+    def shopping_list(self):
+        return dict(ShoppingListItem.objects.filter(
+            user=self.user
+        ).values_list('ingredient', 'amount'))
+
+    def assert_shopping_list_consistent(self):
+        current = self.shopping_list()
+        shopping_list.rebuild([self.user.pk])
+        self.assertEqual(current, self.shopping_list())
+
+    def race(self, concurrent):
+        """Выполняет concurrent между проверкой пакета и записью."""
+        check = batch.check
+
+        def racing_check(*args, **kwargs):
+            checked = check(*args, **kwargs)
+            concurrent()
+            return checked
+
+        return mock.patch.object(batch, 'check', racing_check)
+
+    def test_concurrent_add_counted_once(self):
+        url = reverse('api:api:recipes-shopping-cart-batch')
+        recipe = self.fixture['recipes'][1]
+        with self.race(lambda: ShoppingCart.objects.create(
+            author=self.user, recipe=recipe
+        )):
+            response = self.client.post(
+                url, {'ids': [recipe.pk]}, format='json'
+            )
+        self.assertEqual(self.statuses(response), {recipe.pk: 400})
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.shopping_cart_count, 1)
+        self.assert_shopping_list_consistent()
+
+    def test_concurrent_remove_counted_once(self):
+        url = reverse('api:api:recipes-shopping-cart-batch')
+        recipe = self.fixture['recipes'][0]
+        with self.race(lambda: ShoppingCart.objects.filter(
+            author=self.user, recipe=recipe
+        ).delete()):
+            response = self.client.delete(
+                url, {'ids': [recipe.pk]}, format='json'
+            )
+        self.assertEqual(self.statuses(response), {recipe.pk: 400})
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.shopping_cart_count, 0)
+        self.assert_shopping_list_consistent()
@@ -0,0 +1,86 @@
+"""Условные GET-запросы к рецепту и отслеживание его изменений."""
+import time
+
+from django.urls import reverse
+from django.utils.http import http_date
+from recipes.models import FavoriteRecipe, Recipe
+
+from .fixtures import SeededTestCase
+
+
+class RecipeConditionalGetTest(SeededTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.recipe = self.fixture['recipes'][1]
+        self.url = reverse('api:api:recipes-detail', args=[self.recipe.id])
+
+    def version(self):
+        return Recipe.objects.values_list(
+            'version', flat=True
+        ).get(pk=self.recipe.pk)
+
+    def test_not_modified_without_serialization(self):
+        first = self.client.get(self.url)
+        self.assertEqual(first.status_code, 200)
+        self.assertNotIn('Last-Modified', first)
+        with self.assertNumQueries(1):
+            second = self.client.get(
+                self.url, HTTP_IF_NONE_MATCH=first['ETag']
+            )
+        self.assertEqual(second.status_code, 304)
+        self.assertEqual(second['ETag'], first['ETag'])
+
+    def test_if_modified_since_ignored(self):
+        first = self.client.get(self.url)
+        FavoriteRecipe.objects.create(
+            author=self.user, recipe=self.recipe
+        )
+        response = self.client.get(
+            self.url, HTTP_IF_MODIFIED_SINCE=http_date(time.time() + 60)
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.data['is_favorited'])
+        self.assertNotEqual(response['ETag'], first['ETag'])
+
+    def test_etag_follows_user_flags(self):
+        etag = self.client.get(self.url)['ETag']
+        FavoriteRecipe.objects.create(
+            author=self.user, recipe=self.recipe
+        )
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.data['is_favorited'])
+
+    def test_version_follows_tags_and_ingredients(self):
+        version = self.version()
+        self.recipe.tags.add(self.fixture['tags'][-1])
+        self.assertEqual(self.version(), version + 1)
+        self.recipe.recipe.first().ingredient.save()
+        self.assertEqual(self.version(), version + 2)
+        self.fixture['tags'][0].save()
+        self.assertEqual(self.version(), version + 3)
+
+    def test_version_bumped_by_update(self):
+        recipe = self.fixture['own_recipe']
+        url = reverse('api:api:recipes-detail', args=[recipe.id])
+        recipe.refresh_from_db()
+        version = recipe.version
+        etag = self.client.get(url)['ETag']
+        response = self.client.patch(url, {
+            'name': 'Обновлённый рецепт',
+            'text': 'Новое описание рецепта.',
+            'cooking_time': 10,
+            'tags': [tag.id for tag in self.fixture['tags']],
+            'ingredients': [
+                {'id': ingredient.id, 'amount': 5}
+                for ingredient in self.fixture['ingredients'][5:15]
+            ],
+        }, format='json')
+        self.assertEqual(response.status_code, 200)
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.version, version + 1)
+        self.assertGreater(recipe.updated_at, recipe.pub_date)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['name'], 'Обновлённый рецепт')
@@ -0,0 +1,75 @@
+"""Денормализованные счётчики рецептов и пользователей."""
+from io import StringIO
+
+from django.contrib import admin
+from django.core.management import call_command
+from recipes.models import FavoriteRecipe, Recipe, ShoppingCart, Subscribe
+from users.models import User
+
+from .fixtures import SeededTestCase
+
+
+class CountersTest(SeededTestCase):
+
+    def assertCountersConsistent(self):
+        for recipe in Recipe.objects.all():
+            self.assertEqual(
+                recipe.favorites_count, recipe.is_favorited.count()
+            )
+            self.assertEqual(
+                recipe.shopping_cart_count,
+                recipe.is_in_shopping_cart.count(),
+            )
+        for user in User.objects.all():
+            self.assertEqual(user.recipes_count, user.recipe.count())
+            self.assertEqual(
+                user.subscribers_count, user.subscribed.count()
+            )
+
+    def test_updated_by_signals(self):
+        self.assertCountersConsistent()
+        user = self.user
+        recipe = self.fixture['recipes'][1]
+        FavoriteRecipe.objects.create(author=user, recipe=recipe)
+        ShoppingCart.objects.create(author=user, recipe=recipe)
+        Subscribe.objects.create(user=user, author=self.fixture['authors'][4])
+        Subscribe.objects.filter(author=self.fixture['authors'][0]).delete()
+        self.assertCountersConsistent()
+
+    def test_cascade_delete(self):
+        self.fixture['own_recipe'].delete()
+        self.fixture['authors'][0].delete()
+        self.assertCountersConsistent()
+        self.user.delete()
+        self.assertCountersConsistent()
+
+    def test_rebuild(self):
+        Recipe.objects.update(favorites_count=100, shopping_cart_count=100)
+        User.objects.update(recipes_count=100, subscribers_count=100)
+        call_command('rebuild_counters', stdout=StringIO())
+        self.assertCountersConsistent()
+
+    def test_edit_keeps_concurrent_updates(self):
+        user = self.user
+        recipe = self.fixture['recipes'][1]
+        variants = {'small': 'recipes/variants/small.jpg'}
+        for number, save in enumerate((
+            lambda stale: stale.save_edited(),
+            lambda stale: admin.site._registry[Recipe].save_model(
+                None, stale, None, change=True
+            ),
+        )):
+            stale = Recipe.objects.get(pk=recipe.pk)
+            ShoppingCart.objects.filter(recipe=recipe).delete()
+            ShoppingCart.objects.create(author=user, recipe=recipe)
+            Recipe.objects.filter(pk=recipe.pk).update(
+                image_variants=variants
+            )
+            version = stale.version
+            stale.name = f'Правка {number}'
+            save(stale)
+            self.assertEqual(stale.version, version + 1)
+            fresh = Recipe.objects.get(pk=recipe.pk)
+            self.assertEqual(fresh.name, f'Правка {number}')
+            self.assertEqual(fresh.image_variants, variants)
+            self.assertCountersConsistent()
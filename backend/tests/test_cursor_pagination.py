@@ -0,0 +1,66 @@
+"""Режим курсора для ленты рецептов и страницы подписок."""
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from recipes.models import Recipe
+
+from .fixtures import SeededTestCase
+
+
+class CursorPaginationTest(SeededTestCase):
+
+    def walk(self, url, params):
+        """Проходит все страницы и возвращает id и число запросов."""
+        ids, queries = [], []
+        response = self.client.get(url, params)
+        while True:
+            self.assertEqual(response.status_code, 200)
+            self.assertNotIn('count', response.data)
+            ids.extend(item['id'] for item in response.data['results'])
+            if response.data['next'] is None:
+                return ids, queries
+            with CaptureQueriesContext(connection) as captured:
+                response = self.client.get(response.data['next'])
+            queries.append(len(captured))
+
+    def test_recipe_feed(self):
+        ids, queries = self.walk(
+            reverse('api:api:recipes-list'), {'cursor': '', 'limit': 7}
+        )
+        self.assertEqual(
+            ids,
+            list(Recipe.objects.order_by(
+                '-pub_date', '-id'
+            ).values_list('id', flat=True)),
+        )
+        self.assertEqual(len(set(queries)), 1)
+
+    def test_combines_with_filters(self):
+        tag = self.fixture['tags'][2]
+        ids, _ = self.walk(
+            reverse('api:api:recipes-list'),
+            {'cursor': '', 'limit': 5, 'tags': tag.slug},
+        )
+        self.assertEqual(
+            ids,
+            list(tag.recipe.order_by(
+                '-pub_date', '-id'
+            ).values_list('id', flat=True)),
+        )
+
+    def test_subscriptions(self):
+        ids, _ = self.walk(
+            reverse('api:api:users-subscriptions'), {'cursor': '', 'limit': 2}
+        )
+        self.assertEqual(
+            ids,
+            list(self.user.subscriber.order_by(
+                '-pub_date', '-id'
+            ).values_list('author', flat=True)),
+        )
+
+    def test_invalid_cursor(self):
+        response = self.client.get(
+            reverse('api:api:recipes-list'), {'cursor': 'не курсор'}
+        )
+        self.assertEqual(response.status_code, 404)
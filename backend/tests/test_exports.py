@@ -0,0 +1,64 @@
+"""Форматы выгрузки списка покупок."""
+import csv
+import json
+
+from django.urls import reverse
+from recipes.models import ShoppingListItem
+from rest_framework.test import APIClient
+
+from .fixtures import SeededTestCase
+
+
+class ShoppingListExportTest(SeededTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.url = reverse('api:api:recipes-download-shopping-cart')
+        self.items = ShoppingListItem.objects.filter(
+            user=self.user
+        ).count()
+
+    def download(self, **kwargs):
+        response = self.client.get(self.url, **kwargs)
+        self.assertEqual(response.status_code, 200)
+        return response, b''.join(response.streaming_content)
+
+    def test_pdf_by_default(self):
+        response, content = self.download()
+        self.assertEqual(response['Content-Type'], 'application/pdf')
+        self.assertTrue(content.startswith(b'%PDF'))
+        self.assertIn('shopping_cart.pdf', response['Content-Disposition'])
+
+    def test_json(self):
+        response, content = self.download(HTTP_ACCEPT='application/json')
+        self.assertTrue(response['Content-Type'].startswith(
+            'application/json'
+        ))
+        rows = json.loads(content.decode())
+        self.assertEqual(len(rows), self.items)
+        self.assertEqual(
+            set(rows[0]), {'name', 'amount', 'measurement_unit'}
+        )
+
+    def test_csv(self):
+        response, content = self.download(data={'format': 'csv'})
+        self.assertTrue(response['Content-Type'].startswith('text/csv'))
+        rows = list(csv.reader(content.decode().splitlines()))
+        self.assertEqual(rows[0], ['name', 'amount', 'measurement_unit'])
+        self.assertEqual(len(rows), self.items + 1)
+
+    def test_text(self):
+        response, content = self.download(HTTP_ACCEPT='text/plain')
+        self.assertEqual(len(content.decode().splitlines()), self.items)
+        self.assertIn('Accept', response['Vary'])
+
+    def test_empty_json(self):
+        ShoppingListItem.objects.all().delete()
+        _, content = self.download(data={'format': 'json'})
+        self.assertEqual(json.loads(content.decode()), [])
+
+    def test_errors_rendered_as_json(self):
+        response = APIClient().get(self.url, HTTP_ACCEPT='application/pdf')
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response['Content-Type'], 'application/json')
+        self.assertIn('detail', json.loads(response.content))
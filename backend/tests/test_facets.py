@@ -0,0 +1,76 @@
+"""Счётчики фасетов в списке рецептов."""
+from django.urls import reverse
+from recipes.models import FavoriteRecipe, Recipe, ShoppingCart, Tag
+
+from .fixtures import SeededTestCase
+
+
+class FacetsTest(SeededTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.url = reverse('api:api:recipes-list')
+
+    def facets(self, **params):
+        response = self.client.get(self.url, {'facets': 1, **params})
+        self.assertEqual(response.status_code, 200)
+        return response.data['facets']
+
+    def test_counts_match_filtered_queryset(self):
+        recipes = Recipe.objects.filter(tags__slug='tag0')
+        facets = self.facets(tags='tag0', limit=1)
+        self.assertEqual(facets['total'], recipes.count())
+        for tag in Tag.objects.all():
+            self.assertEqual(
+                facets['tags'][tag.slug],
+                recipes.filter(tags=tag).count(),
+            )
+        self.assertEqual(
+            facets['is_favorited'],
+            FavoriteRecipe.objects.filter(
+                author=self.user, recipe__in=recipes
+            ).count(),
+        )
+        self.assertEqual(
+            facets['is_in_shopping_cart'],
+            ShoppingCart.objects.filter(
+                author=self.user, recipe__in=recipes
+            ).count(),
+        )
+
+    def test_without_parameter(self):
+        response = self.client.get(self.url)
+        self.assertNotIn('facets', response.data)
+
+    def test_cached_per_filters(self):
+        self.client.get(self.url, {'limit': 1})
+        with self.assertNumQueries(2):
+            self.client.get(self.url, {'limit': 1})
+        self.facets(limit=1, page=2)
+        with self.assertNumQueries(2):
+            self.facets(limit=1)
+        self.client.get(self.url, {'limit': 1, 'tags': 'tag1'})
+        with self.assertNumQueries(3):
+            self.facets(limit=1, tags='tag1')
+
+    def test_invalidated_by_favorite(self):
+        recipe = self.fixture['recipes'][1]
+        before = self.facets()['is_favorited']
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(
+                reverse('api:api:recipes-favorite', args=[recipe.pk])
+            )
+        self.assertEqual(self.facets()['is_favorited'], before + 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            FavoriteRecipe.objects.filter(
+                author=self.user, recipe=recipe
+            ).delete()
+        self.assertEqual(self.facets()['is_favorited'], before)
+
+    def test_invalidated_by_tag_change(self):
+        recipe = self.fixture['recipes'][0]
+        tag = Tag.objects.create(name='Новый', slug='fresh', color='#FFFFFF')
+        self.assertEqual(self.facets()['tags']['fresh'], 0)
+        with self.captureOnCommitCallbacks(execute=True):
+            recipe.tags.add(tag)
+        self.assertEqual(self.facets()['tags']['fresh'], 1)
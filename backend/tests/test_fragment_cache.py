@@ -0,0 +1,72 @@
+"""Кеш общей части рецептов с наложением личных флагов."""
+from unittest import mock
+
+from django.urls import reverse
+from recipes.models import Subscribe
+from rest_framework.test import APIClient
+
+from .fixtures import SeededTestCase
+
+
+class RecipeFragmentCacheTest(SeededTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.url = reverse('api:api:recipes-list')
+
+    def detail_url(self, recipe):
+        return reverse('api:api:recipes-detail', args=[recipe.id])
+
+    def test_authenticated_hits_skip_prefetches(self):
+        first = self.client.get(self.url, {'limit': 10})
+        with self.assertNumQueries(2):
+            second = self.client.get(self.url, {'limit': 10})
+        self.assertEqual(second.data, first.data)
+        recipe = self.fixture['own_recipe']
+        self.client.get(self.detail_url(recipe))
+        with self.assertNumQueries(1):
+            response = self.client.get(self.detail_url(recipe))
+        self.assertEqual(response.data['id'], recipe.id)
+
+    def test_flags_overlaid_per_user(self):
+        recipe = self.fixture['own_recipe']
+        mine = self.client.get(self.detail_url(recipe)).data
+        other = APIClient()
+        other.force_authenticate(self.fixture['authors'][0])
+        theirs = other.get(self.detail_url(recipe)).data
+        self.assertTrue(mine['is_favorited'])
+        self.assertTrue(mine['is_in_shopping_cart'])
+        self.assertFalse(theirs['is_favorited'])
+        self.assertFalse(theirs['is_in_shopping_cart'])
+        self.assertEqual(
+            {**mine, 'is_favorited': False, 'is_in_shopping_cart': False},
+            theirs,
+        )
+        self.assertEqual(list(mine), list(theirs))
+
+    def test_author_subscription_overlaid(self):
+        author = self.fixture['authors'][0]
+        recipe = author.recipe.first()
+        self.assertTrue(
+            self.client.get(self.detail_url(recipe)).data['author'][
+                'is_subscribed'
+            ]
+        )
+        Subscribe.objects.filter(
+            user=self.user, author=author
+        ).delete()
+        self.assertFalse(
+            self.client.get(self.detail_url(recipe)).data['author'][
+                'is_subscribed'
+            ]
+        )
+
+    def test_invalidated_on_change(self):
+        recipe = self.fixture['own_recipe']
+        self.client.get(self.detail_url(recipe))
+        with mock.patch('recipes.images.schedule'), \
+                self.captureOnCommitCallbacks(execute=True):
+            recipe.name = 'Новое название'
+            recipe.save()
+        response = self.client.get(self.detail_url(recipe))
+        self.assertEqual(response.data['name'], 'Новое название')
@@ -0,0 +1,118 @@
+"""Хранение картинок по хешу содержимого и удаление по ссылкам."""
+import base64
+import os
+import shutil
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import override_settings
+from django.urls import reverse
+from recipes.models import Recipe
+from recipes.storage import image_storage
+
+from .fixtures import SeededTestCase, make_image
+from .test_query_budget import recipe_payload
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+def data_uri(color):
+    image = make_image(size=(4, 4), color=color)
+    return 'data:image/png;base64,' + base64.b64encode(image).decode()
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class ImageStorageTest(SeededTestCase):
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        super().setUp()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+        patcher = mock.patch('recipes.images.schedule')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def create(self, name, image):
+        payload = {**recipe_payload(self.fixture), 'name': name}
+        payload['image'] = image
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                reverse('api:api:recipes-list'), payload, format='json'
+            )
+        self.assertEqual(response.status_code, 201, response.data)
+        return Recipe.objects.get(pk=response.data['id'])
+
+    def files(self):
+        return sorted(
+            os.path.relpath(os.path.join(path, name), MEDIA_ROOT)
+            for path, _, names in os.walk(MEDIA_ROOT) for name in names
+        )
+
+    def test_same_image_stored_once(self):
+        first = self.create('Первый', data_uri('red'))
+        second = self.create('Второй', data_uri('red'))
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertTrue(image_storage.is_content_addressed(first.image.name))
+        self.assertEqual(self.files(), [first.image.name])
+
+    def test_deleted_with_last_reference(self):
+        first = self.create('Первый', data_uri('red'))
+        second = self.create('Второй', data_uri('red'))
+        with self.captureOnCommitCallbacks(execute=True):
+            first.delete()
+        self.assertTrue(image_storage.exists(second.image.name))
+        with self.captureOnCommitCallbacks(execute=True):
+            second.delete()
+        self.assertEqual(self.files(), [])
+
+    def test_replaced_image_released(self):
+        recipe = self.create('Рецепт', data_uri('red'))
+        old = recipe.image.name
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.patch(
+                reverse('api:api:recipes-detail', kwargs={'pk': recipe.pk}),
+                {**recipe_payload(self.fixture), 'image': data_uri('blue')},
+                format='json',
+            )
+        self.assertEqual(response.status_code, 200, response.data)
+        recipe.refresh_from_db()
+        self.assertNotEqual(recipe.image.name, old)
+        self.assertEqual(self.files(), [recipe.image.name])
+
+    def test_stored_image_url_accepted(self):
+        first = self.create('Первый', data_uri('red'))
+        second = self.create('Копия', f'http://testserver{first.image.url}')
+        self.assertEqual(second.image.name, first.image.name)
+
+    def test_reference_and_release_share_lock(self):
+        with mock.patch('recipes.storage.advisory_lock') as lock:
+            first = self.create('Первый', data_uri('red'))
+            self.create('Копия', f'http://testserver{first.image.url}')
+            with self.captureOnCommitCallbacks(execute=True):
+                Recipe.objects.filter(image=first.image.name).delete()
+        key = f'{image_storage.location}:{first.image.name}'
+        # Загрузка, ссылка на лежащий файл и проверки перед удалением
+        # после каждого из двух рецептов.
+        self.assertEqual(lock.call_args_list, [mock.call(key)] * 4)
+        self.assertEqual(self.files(), [])
+
+    def test_dedupe_command(self):
+        recipe = self.fixture['own_recipe']
+        path = os.path.join(MEDIA_ROOT, 'recipes', 'legacy.png')
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as file:
+            file.write(make_image(size=(4, 4), color='green'))
+        Recipe.objects.filter(pk=recipe.pk).update(image='recipes/legacy.png')
+        recipe.refresh_from_db()
+        version = recipe.version
+        call_command('dedupe_images', stdout=StringIO(), stderr=StringIO())
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.version, version + 1)
+        self.assertTrue(image_storage.is_content_addressed(recipe.image.name))
+        self.assertEqual(self.files(), [recipe.image.name])
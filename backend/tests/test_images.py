@@ -0,0 +1,155 @@
+"""Уменьшенные копии картинок рецептов."""
+import shutil
+import tempfile
+from io import BytesIO, StringIO
+from unittest import mock
+
+from api.v1 import response_cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.test import override_settings
+from django.urls import reverse
+from PIL import Image
+from recipes import images
+from recipes.models import Recipe
+from rest_framework.test import APIClient
+
+from .fixtures import SeededTestCase
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+def photo():
+    """JPEG 2000×1000 с EXIF: камера и поворот на 90°."""
+    exif = Image.Exif()
+    exif[0x010F] = 'Camera'
+    exif[0x0112] = 6
+    buffer = BytesIO()
+    Image.new('RGB', (2000, 1000), 'orange').save(
+        buffer, 'JPEG', exif=exif.tobytes()
+    )
+    return ContentFile(buffer.getvalue(), name='photo.jpg')
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class RecipeImagesTest(SeededTestCase):
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def create_recipe(self, name='Фото'):
+        with self.captureOnCommitCallbacks() as callbacks:
+            recipe = Recipe.objects.create(
+                author=self.fixture['authors'][0], name=name,
+                text='Описание.', cooking_time=5, image=photo(),
+            )
+        return recipe, callbacks
+
+    def test_scheduled_after_commit(self):
+        with mock.patch('recipes.images.schedule') as schedule:
+            recipe, callbacks = self.create_recipe()
+            schedule.assert_not_called()
+            for callback in callbacks:
+                callback()
+        schedule.assert_called_once_with(recipe.pk)
+
+    def test_list_cache_invalidated(self):
+        recipe, _ = self.create_recipe()
+        version = response_cache.version()
+        with self.captureOnCommitCallbacks(execute=True):
+            images.process(recipe.pk)
+        self.assertNotEqual(response_cache.version(), version)
+
+    def test_variants(self):
+        recipe, _ = self.create_recipe()
+        images.process(recipe.pk)
+        recipe.refresh_from_db()
+        self.assertFalse(images.needs_processing(recipe))
+        sizes = recipe.image_variants['sizes']
+        self.assertEqual(set(sizes), set(images.SIZES))
+        for size, formats in sizes.items():
+            self.assertEqual(set(formats), set(images.EXTENSIONS))
+            for image_format, name in formats.items():
+                with default_storage.open(name) as file, \
+                        Image.open(file) as variant:
+                    self.assertEqual(
+                        variant.format, images.FORMATS[image_format][0]
+                    )
+                    # Поворот из EXIF применён, сами метаданные убраны.
+                    width = min(images.SIZES[size], 1000)
+                    self.assertEqual(variant.size, (width, width * 2))
+                    self.assertFalse(variant.getexif())
+
+    def variant_names(self, recipe):
+        recipe.refresh_from_db()
+        return [
+            name
+            for formats in recipe.image_variants['sizes'].values()
+            for name in formats.values()
+        ]
+
+    def test_variants_shared_by_source(self):
+        first, _ = self.create_recipe()
+        second, _ = self.create_recipe('Та же картинка')
+        images.process(first.pk)
+        names = self.variant_names(first)
+        with mock.patch('recipes.images.save_variants') as save_variants:
+            images.process(second.pk)
+        save_variants.assert_not_called()
+        self.assertEqual(self.variant_names(second), names)
+        with self.captureOnCommitCallbacks(execute=True):
+            first.delete()
+        self.assertTrue(all(map(default_storage.exists, names)))
+        with self.captureOnCommitCallbacks(execute=True):
+            second.delete()
+        self.assertFalse(any(map(default_storage.exists, names)))
+
+    def test_legacy_variants_deleted(self):
+        recipe, _ = self.create_recipe()
+        legacy = default_storage.save(
+            'recipes/variants/photo-small.jpg', ContentFile(b'old')
+        )
+        Recipe.objects.filter(pk=recipe.pk).update(
+            image_variants={'sizes': {'small': {'jpeg': legacy}}}
+        )
+        images.process(recipe.pk)
+        self.assertFalse(default_storage.exists(legacy))
+        self.assertTrue(all(
+            map(default_storage.exists, self.variant_names(recipe))
+        ))
+
+    def test_rebuild_all(self):
+        recipe, _ = self.create_recipe()
+        images.process(recipe.pk)
+        names = self.variant_names(recipe)
+        for name in names:
+            with default_storage.open(name, 'wb') as file:
+                file.write(b'broken')
+        call_command(
+            'process_images', stdout=StringIO(), stderr=StringIO()
+        )
+        with default_storage.open(names[0]) as file:
+            self.assertEqual(file.read(), b'broken')
+        call_command(
+            'process_images', '--all', stdout=StringIO(), stderr=StringIO()
+        )
+        self.assertEqual(self.variant_names(recipe), names)
+        for name in names:
+            with default_storage.open(name) as file, Image.open(file):
+                pass
+
+    def test_serialized(self):
+        recipe, _ = self.create_recipe()
+        images.process(recipe.pk)
+        client = APIClient()
+        response = client.get(
+            reverse('api:api:recipes-detail', kwargs={'pk': recipe.pk})
+        )
+        thumbnails = response.data['thumbnails']
+        self.assertEqual(set(thumbnails), set(images.SIZES))
+        self.assertTrue(
+            thumbnails['small']['jpeg'].startswith('http://testserver/media/')
+        )
@@ -0,0 +1,114 @@
+"""Добавление и удаление избранного, покупок и подписок по одной связи."""
+from unittest import mock
+
+from django.test import TransactionTestCase
+from django.urls import reverse
+from recipes import links, shopping_list
+from recipes.models import (FavoriteRecipe, Recipe, ShoppingCart, Subscribe,
+                            TimelineEntry)
+
+from .fixtures import SeededTestCase, clear_caches, seed
+
+
+class LinksTest(SeededTestCase):
+
+    def test_repeated_link_is_ignored(self):
+        recipe = self.fixture['recipes'][1]
+        self.assertTrue(
+            links.link(FavoriteRecipe, self.user.pk, recipe.pk)
+        )
+        self.assertFalse(
+            links.link(FavoriteRecipe, self.user.pk, recipe.pk)
+        )
+        self.assertEqual(Recipe.objects.get(pk=recipe.pk).favorites_count, 1)
+        self.assertTrue(
+            links.unlink(FavoriteRecipe, self.user.pk, recipe.pk)
+        )
+        self.assertFalse(
+            links.unlink(FavoriteRecipe, self.user.pk, recipe.pk)
+        )
+        self.assertEqual(Recipe.objects.get(pk=recipe.pk).favorites_count, 0)
+
+    def test_every_path_sends_links_changed(self):
+        calls = []
+
+        def receiver(sender, user_id, target_ids, created, **kwargs):
+            calls.append((sender, user_id, target_ids, created))
+
+        links.links_changed.connect(receiver)
+        self.addCleanup(links.links_changed.disconnect, receiver)
+        recipe = self.fixture['recipes'][1]
+        links.link(FavoriteRecipe, self.user.pk, recipe.pk)
+        self.client.delete(
+            reverse('api:api:recipes-favorite-batch'),
+            {'ids': [recipe.pk]}, format='json',
+        )
+        FavoriteRecipe.objects.create(author=self.user, recipe=recipe)
+        FavoriteRecipe.objects.filter(recipe=recipe).delete()
+        self.assertEqual(calls, [
+            (FavoriteRecipe, self.user.pk, [recipe.pk], True),
+            (FavoriteRecipe, self.user.pk, [recipe.pk], False),
+            (FavoriteRecipe, self.user.pk, [recipe.pk], True),
+            (FavoriteRecipe, self.user.pk, [recipe.pk], False),
+        ])
+
+    def test_favorite_responses(self):
+        recipe = self.fixture['recipes'][1]
+        url = reverse('api:api:recipes-favorite', args=[recipe.pk])
+        self.assertEqual(self.client.post(url).status_code, 201)
+        self.assertEqual(self.client.post(url).status_code, 400)
+        self.assertEqual(self.client.delete(url).status_code, 204)
+        self.assertEqual(self.client.delete(url).status_code, 400)
+        missing = reverse(
+            'api:api:recipes-favorite',
+            args=[Recipe.objects.latest('pk').pk + 1],
+        )
+        self.assertEqual(self.client.post(missing).status_code, 404)
+        self.assertEqual(self.client.delete(missing).status_code, 404)
+
+    def test_subscribe_responses(self):
+        author = self.fixture['authors'][-1]
+        url = reverse('api:api:users-subscribe', args=[author.pk])
+        response = self.client.post(url)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['id'], author.pk)
+        self.assertTrue(Subscribe.objects.filter(
+            user=self.user, author=author
+        ).exists())
+        self.assertTrue(TimelineEntry.objects.filter(
+            user=self.user, author=author
+        ).exists())
+        self.assertEqual(self.client.post(url).status_code, 400)
+        self.assertEqual(self.client.delete(url).status_code, 204)
+        self.assertFalse(TimelineEntry.objects.filter(
+            user=self.user, author=author
+        ).exists())
+        self.assertEqual(self.client.delete(url).status_code, 400)
+        own = reverse('api:api:users-subscribe', args=[self.user.pk])
+        self.assertEqual(self.client.post(own).status_code, 400)
+
+
+class LinkTransactionTest(TransactionTestCase):
+    """Связь и производные данные без внешней транзакции теста."""
+
+    def setUp(self):
+        # Без внешней транзакции on_commit срабатывает сразу, а файлов
+        # картинок у тестовых рецептов нет.
+        patcher = mock.patch('recipes.images.schedule')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        clear_caches()
+        self.fixture = seed()
+        self.user = self.fixture['user']
+
+    def test_receiver_failure_rolls_back_link(self):
+        recipe = self.fixture['recipes'][1]
+        with mock.patch.object(
+            shopping_list, 'add', side_effect=RuntimeError
+        ), self.assertRaises(RuntimeError):
+            links.link(ShoppingCart, self.user.pk, recipe.pk)
+        self.assertFalse(ShoppingCart.objects.filter(
+            author=self.user, recipe=recipe
+        ).exists())
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.shopping_cart_count, 0)
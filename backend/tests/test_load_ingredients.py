@@ -0,0 +1,109 @@
+"""Загрузка ингредиентов из CSV и JSON."""
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.conf import settings
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase
+from recipes.management.commands import load_ingredients
+from recipes.models import Ingredient
+
+
+class ReadersTest(SimpleTestCase):
+
+    def test_csv(self):
+        file = StringIO('соль,г\n\nмолоко,мл\n')
+        self.assertEqual(
+            list(load_ingredients.read_csv(file)),
+            [('соль', 'г'), ('молоко', 'мл')],
+        )
+
+    def test_json(self):
+        file = StringIO(json.dumps([
+            {'name': 'соль', 'measurement_unit': 'г'},
+            {'name': 'молоко', 'measurement_unit': 'мл'},
+        ], ensure_ascii=False))
+        self.assertEqual(
+            list(load_ingredients.read_json(file)),
+            [('соль', 'г'), ('молоко', 'мл')],
+        )
+
+    def test_json_object_across_block_boundary(self):
+        head = '[{"name": "'
+        tail = '", "measurement_unit": "г"}, '
+        second = '{"name": "молоко", "measurement_unit": "мл"}'
+        padding = 'х' * (
+            load_ingredients.JSON_BLOCK_SIZE - 20 - len(head) - len(tail)
+        )
+        text = head + padding + tail + second + ']'
+        boundary = load_ingredients.JSON_BLOCK_SIZE
+        self.assertLess(text.index(second), boundary)
+        self.assertGreater(text.index(second) + len(second), boundary)
+        self.assertEqual(
+            list(load_ingredients.read_json(StringIO(text))),
+            [(padding, 'г'), ('молоко', 'мл')],
+        )
+
+    def test_json_not_array(self):
+        with self.assertRaises(load_ingredients.CommandError):
+            list(load_ingredients.read_json(StringIO('{}')))
+
+
+class LoadIngredientsTest(TestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'ingredients.csv')
+
+    def load(self, content, **options):
+        with open(self.path, 'w', encoding='UTF-8') as file:
+            file.write(content)
+        stdout = StringIO()
+        call_command(
+            'load_ingredients', path=self.path, stdout=stdout, **options
+        )
+        return stdout.getvalue()
+
+    def test_counts_and_duplicates(self):
+        Ingredient.objects.create(
+            name='пекарский порошок', measurement_unit='г'
+        )
+        output = self.load(
+            'сахар,г\n'
+            'пекарский порошок,ч. л.\n'
+            'мука,г\n'
+            'сахар,кг\n'
+            'мука,г\n',
+            batch_size=2,
+        )
+        self.assertIn('Добавлено: 2, пропущено: 3.', output)
+        self.assertEqual(
+            dict(Ingredient.objects.values_list('name', 'measurement_unit')),
+            {'пекарский порошок': 'г', 'сахар': 'г', 'мука': 'г'},
+        )
+
+    def test_idempotent(self):
+        content = 'сахар,г\nмука,г\n'
+        self.assertIn('Добавлено: 2, пропущено: 0.', self.load(content))
+        self.assertIn('Добавлено: 0, пропущено: 2.', self.load(content))
+        self.assertEqual(Ingredient.objects.count(), 2)
+
+    def test_bundled_files_keep_loaded_units(self):
+        call_command('load_ingredients', stdout=StringIO())
+        units = dict(
+            Ingredient.objects.values_list('name', 'measurement_unit')
+        )
+        call_command(
+            'load_ingredients',
+            path=os.path.join(settings.BASE_DIR, 'data', 'ingredients.json'),
+            stdout=StringIO(),
+        )
+        self.assertEqual(
+            dict(Ingredient.objects.filter(
+                name__in=units
+            ).values_list('name', 'measurement_unit')),
+            units,
+        )
@@ -0,0 +1,44 @@
+"""Кеш готовых ответов справочников и условные запросы к ним."""
+from django.urls import reverse
+from recipes.models import Tag
+
+from .fixtures import SeededTestCase
+
+
+class PayloadCacheTest(SeededTestCase):
+
+    authenticated = False
+
+    def setUp(self):
+        super().setUp()
+        self.url = reverse('api:api:tags-list')
+
+    def test_list_matches_serializer(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [tag['slug'] for tag in response.json()],
+            [tag.slug for tag in Tag.objects.all()],
+        )
+        detail = self.client.get(reverse(
+            'api:api:ingredients-detail',
+            kwargs={'pk': self.fixture['ingredients'][0].pk},
+        ))
+        self.assertEqual(
+            detail.json()['name'], self.fixture['ingredients'][0].name
+        )
+
+    def test_not_modified(self):
+        etag = self.client.get(self.url)['ETag']
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+
+    def test_invalidated_on_change(self):
+        etag = self.client.get(self.url)['ETag']
+        Tag.objects.create(name='Новый тег', slug='new', color='#FFFFFF')
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertIn('new', [tag['slug'] for tag in response.json()])
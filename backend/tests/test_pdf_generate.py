@@ -0,0 +1,69 @@
+"""Вёрстка PDF со списком покупок."""
+import re
+from unittest import mock
+
+from api.v1 import pdf_generate
+from django.test import SimpleTestCase
+from reportlab import rl_config
+from reportlab.pdfbase import pdfmetrics
+
+
+def rows(count):
+    return (
+        {'name': f'Ингредиент {number}', 'amount': number,
+         'measurement_unit': 'г'}
+        for number in range(count)
+    )
+
+
+def pages(file):
+    return len(re.findall(rb'/Type /Page[^s]', file.read()))
+
+
+class PdfGenerateTest(SimpleTestCase):
+
+    def test_paragraph_per_row(self):
+        with mock.patch.object(
+            pdf_generate, 'Paragraph', wraps=pdf_generate.Paragraph
+        ) as paragraph:
+            with pdf_generate.pdf_generate(rows(3)) as file:
+                self.assertTrue(file.read().startswith(b'%PDF'))
+        # Заголовок и по абзацу на каждую строку списка.
+        self.assertEqual(paragraph.call_count, 4)
+        self.assertEqual(
+            paragraph.call_args_list[1].args[0], 'Ингредиент 0 - 0 г'
+        )
+
+    def test_long_list_split_across_pages(self):
+        with pdf_generate.pdf_generate(rows(1)) as file:
+            self.assertEqual(pages(file), 1)
+        with pdf_generate.pdf_generate(rows(500)) as file:
+            self.assertGreater(pages(file), 1)
+
+    def test_markup_escaped(self):
+        row = {'name': 'Соль <крупная> & йод', 'amount': 1,
+               'measurement_unit': 'г'}
+        with pdf_generate.pdf_generate([row]) as file:
+            self.assertTrue(file.read().startswith(b'%PDF'))
+
+
+class PdfBuilderTest(SimpleTestCase):
+
+    def test_font_registered_at_startup(self):
+        self.assertIsInstance(
+            pdf_generate.renderer, pdf_generate.ShoppingListPDFBuilder
+        )
+        self.assertIn('OpenSans', pdfmetrics.getRegisteredFontNames())
+
+    def test_render_reuses_prepared_state(self):
+        search_path = list(rl_config.TTFSearchPath)
+        with mock.patch.object(
+            pdf_generate.pdfmetrics, 'registerFont'
+        ) as register_font, mock.patch.object(
+            pdf_generate, 'getSampleStyleSheet'
+        ) as stylesheet:
+            for _ in range(3):
+                pdf_generate.pdf_generate(rows(2)).close()
+        register_font.assert_not_called()
+        stylesheet.assert_not_called()
+        self.assertEqual(rl_config.TTFSearchPath, search_path)
@@ -0,0 +1,119 @@
+"""Фоновая генерация PDF со списком покупок."""
+import os
+import shutil
+import tempfile
+from concurrent.futures import Executor, Future
+from concurrent.futures.process import BrokenProcessPool
+from unittest import mock
+
+from api.v1 import pdf_jobs
+from django.test import override_settings
+from django.urls import reverse
+from recipes.models import ShoppingCart
+
+from .fixtures import SeededTestCase
+
+SHOPPING_CART_PDF_ROOT = tempfile.mkdtemp()
+
+
+class SyncExecutor(Executor):
+    """Выполняет задачу сразу, в том же процессе."""
+
+    def submit(self, fn, *args, **kwargs):
+        future = Future()
+        try:
+            future.set_result(fn(*args, **kwargs))
+        except Exception as error:
+            future.set_exception(error)
+        return future
+
+
+class BrokenExecutor(Executor):
+
+    def submit(self, fn, *args, **kwargs):
+        raise BrokenProcessPool('Процесс пула завершился.')
+
+
+@override_settings(SHOPPING_CART_PDF_ROOT=SHOPPING_CART_PDF_ROOT)
+class PdfJobsTest(SeededTestCase):
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(SHOPPING_CART_PDF_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        super().setUp()
+        shutil.rmtree(SHOPPING_CART_PDF_ROOT, ignore_errors=True)
+        patcher = mock.patch.object(pdf_jobs, '_executor', SyncExecutor())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def submit(self):
+        response = self.client.post(
+            reverse('api:api:recipes-download-shopping-cart-job')
+        )
+        self.assertEqual(response.status_code, 202)
+        return response.data
+
+    def result(self, job_id):
+        return self.client.get(reverse(
+            'api:api:recipes-download-shopping-cart-result',
+            kwargs={'job_id': job_id},
+        ))
+
+    def test_submit_poll_download(self):
+        job = self.submit()
+        self.assertEqual(job['status'], pdf_jobs.PENDING)
+        response = self.result(job['id'])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/pdf')
+        self.assertTrue(b''.join(response.streaming_content).startswith(
+            b'%PDF'
+        ))
+
+    def test_same_cart_deduplicated(self):
+        first = self.submit()
+        with mock.patch.object(pdf_jobs, 'render') as render:
+            second = self.submit()
+        render.assert_not_called()
+        self.assertEqual(second, {'id': first['id'], 'status': 'ready'})
+
+    def test_changed_cart_replaces_finished_job(self):
+        first = self.submit()
+        ShoppingCart.objects.create(
+            author=self.user, recipe=self.fixture['recipes'][1]
+        )
+        second = self.submit()
+        self.assertNotEqual(second['id'], first['id'])
+        self.assertEqual(self.result(first['id']).status_code, 404)
+        self.assertEqual(self.result(second['id']).status_code, 200)
+
+    def test_running_job_not_removed(self):
+        first = self.submit()
+        running = pdf_jobs.job_path(self.user, '1' * 64, 'pending')
+        open(running, 'w').close()
+        ShoppingCart.objects.create(
+            author=self.user, recipe=self.fixture['recipes'][1]
+        )
+        self.submit()
+        self.assertTrue(os.path.exists(running))
+        self.assertEqual(self.result(first['id']).status_code, 404)
+
+    def test_broken_pool_recreated(self):
+        with mock.patch.object(pdf_jobs, '_executor', BrokenExecutor()), \
+                mock.patch.object(pdf_jobs, 'ProcessPoolExecutor',
+                                  lambda **kwargs: SyncExecutor()):
+            job = self.submit()
+            self.assertIsInstance(pdf_jobs._executor, SyncExecutor)
+        self.assertEqual(self.result(job['id']).status_code, 200)
+
+    def test_dead_worker_marks_job_failed(self):
+        future = Future()
+        future.set_exception(BrokenProcessPool('Процесс пула завершился.'))
+        executor = mock.Mock(submit=mock.Mock(return_value=future))
+        with mock.patch.object(pdf_jobs, '_executor', executor):
+            job = self.submit()
+            self.assertIsNone(pdf_jobs._executor)
+        executor.shutdown.assert_called_once_with(wait=False)
+        self.assertEqual(self.result(job['id']).status_code, 500)
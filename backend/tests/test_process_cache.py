@@ -0,0 +1,48 @@
+"""Данные, собранные в памяти процесса."""
+from api.v1.process_cache import ProcessCache
+from django.test import SimpleTestCase
+
+
+class Counter(ProcessCache):
+
+    def __init__(self, during_build=None):
+        super().__init__()
+        self.builds = 0
+        self.during_build = during_build
+
+    def build(self):
+        self.builds += 1
+        if self.during_build is not None:
+            self.during_build(self)
+            self.during_build = None
+
+
+class ProcessCacheTest(SimpleTestCase):
+
+    def test_built_once(self):
+        cache = Counter()
+        cache.ensure_built()
+        cache.ensure_built()
+        self.assertEqual(cache.builds, 1)
+        cache.invalidate()
+        cache.ensure_built()
+        self.assertEqual(cache.builds, 2)
+
+    def test_invalidate_during_build_not_lost(self):
+        cache = Counter(during_build=ProcessCache.invalidate)
+        cache.ensure_built()
+        cache.ensure_built()
+        self.assertEqual(cache.builds, 2)
+        cache.ensure_built()
+        self.assertEqual(cache.builds, 2)
+
+    def test_rebuilt_after_ttl(self):
+        cache = Counter()
+        cache.ensure_built()
+        cache.built -= cache.ttl + 1
+        cache.ensure_built()
+        self.assertEqual(cache.builds, 2)
+
+    def test_build_required(self):
+        with self.assertRaises(TypeError):
+            ProcessCache()
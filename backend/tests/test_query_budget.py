@@ -0,0 +1,395 @@
+"""Бюджеты SQL-запросов и времени ответа для всех эндпоинтов API.
+
+Каждый маршрут из ``router_v1`` и djoser вызывается анонимно и от имени
+авторизованного пользователя. Для списков проверяется несколько размеров
+страницы: число запросов не должно зависеть от ``limit``. При превышении
+бюджета тест выводит все выполненные запросы.
+"""
+import shutil
+import tempfile
+import time
+from collections import namedtuple
+
+from api.v1.urls import router_v1
+from django.db import connection, transaction
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from djoser.urls import authtoken
+from rest_framework.test import APIClient
+
+from .fixtures import IMAGE, PASSWORD, SeededTestCase
+
+MEDIA_ROOT = tempfile.mkdtemp()
+SHOPPING_CART_PDF_ROOT = tempfile.mkdtemp()
+
+PAGE_SIZES = (1, 10, 50)
+
+# Время ответа в секундах. Бюджет щедрый: он ловит деградацию
+# на порядок, а не шум медленной CI-машины.
+RESPONSE_TIME = 1.0
+
+Endpoint = namedtuple(
+    'Endpoint',
+    'route method kwargs data anonymous authenticated paginated statuses',
+)
+
+
+def endpoint(route, method='get', kwargs=None, data=None,
+             anonymous=0, authenticated=0, paginated=False,
+             statuses=(200, 200)):
+    """statuses — ожидаемые коды ответа анонимному и авторизованному."""
+    return Endpoint(
+        route, method, kwargs, data, anonymous, authenticated, paginated,
+        dict(zip(('anonymous', 'authenticated'), statuses)),
+    )
+
+
+def recipe_payload(fixture):
+    return {
+        'name': 'Новый рецепт',
+        'text': 'Описание нового рецепта.',
+        'cooking_time': 10,
+        'image': IMAGE,
+        'tags': [tag.id for tag in fixture['tags']],
+        'ingredients': [
+            {'id': ingredient.id, 'amount': 10}
+            for ingredient in fixture['ingredients'][:10]
+        ],
+    }
+
+
+def own_recipe(fixture):
+    return {'pk': fixture['own_recipe'].pk}
+
+
+def foreign_recipe(fixture):
+    return {'pk': fixture['recipes'][1].pk}
+
+
+def author(fixture):
+    return {'id': fixture['authors'][-1].pk}
+
+
+def subscribed_author(fixture):
+    return {'id': fixture['authors'][0].pk}
+
+
+def new_recipes(fixture):
+    return {'ids': [recipe.pk for recipe in fixture['recipes'][1::6]]}
+
+
+def favorite_recipes(fixture):
+    return {'ids': [recipe.pk for recipe in fixture['recipes'][::6]]}
+
+
+def new_authors(fixture):
+    return {'ids': [author.pk for author in fixture['authors'][3:]]}
+
+
+def subscribed_authors(fixture):
+    return {'ids': [author.pk for author in fixture['authors'][:3]]}
+
+
+def pdf_job(fixture):
+    return {'job_id': '0' * 64}
+
+
+def tag(fixture):
+    return {'pk': fixture['tags'][0].pk}
+
+
+def ingredient(fixture):
+    return {'pk': fixture['ingredients'][0].pk}
+
+
+ENDPOINTS = (
+    endpoint(
+        'api-root', anonymous=0, authenticated=0,
+        statuses=(401, 200),
+    ),
+    endpoint('users-list', anonymous=2, authenticated=3, paginated=True),
+    endpoint(
+        'users-list', 'post',
+        data={
+            'email': 'new@foodgram.ru', 'username': 'new',
+            'first_name': 'Новый', 'last_name': 'Пользователь',
+            'password': PASSWORD,
+        },
+        anonymous=4, authenticated=4,
+        statuses=(201, 201),
+    ),
+    endpoint(
+        'users-detail', kwargs=author, anonymous=1, authenticated=2,
+        statuses=(401, 200),
+    ),
+    endpoint(
+        'users-detail', 'patch', kwargs=author, data={'first_name': 'Имя'},
+        anonymous=0, authenticated=3,
+        statuses=(401, 200),
+    ),
+    endpoint(
+        'users-me', anonymous=0, authenticated=1,
+        statuses=(401, 200),
+    ),
+    endpoint(
+        'users-set-password', 'post',
+        data={'current_password': PASSWORD, 'new_password': PASSWORD + '1'},
+        anonymous=0, authenticated=2,
+        statuses=(401, 204),
+    ),
+    endpoint(
+        'users-set-username', 'post',
+        data={'current_password': PASSWORD, 'new_username': 'me'},
+        anonymous=0, authenticated=3,
+        statuses=(401, 204),
+    ),
+    endpoint(
+        'users-activation', 'post', data={'uid': 'x', 'token': 'x'},
+        anonymous=0, authenticated=0,
+        statuses=(400, 400),
+    ),
+    endpoint(
+        'users-resend-activation', 'post',
+        data={'email': 'reader@foodgram.ru'},
+        anonymous=1, authenticated=1,
+        statuses=(400, 400),
+    ),
+    endpoint(
+        'users-reset-password', 'post', data={'email': 'reader@foodgram.ru'},
+        anonymous=1, authenticated=1,
+        statuses=(204, 204),
+    ),
+    endpoint(
+        'users-reset-password-confirm', 'post',
+        data={'uid': 'x', 'token': 'x', 'new_password': PASSWORD},
+        anonymous=0, authenticated=0,
+        statuses=(400, 400),
+    ),
+    endpoint(
+        'users-reset-username', 'post', data={'email': 'reader@foodgram.ru'},
+        anonymous=1, authenticated=1,
+        statuses=(204, 204),
+    ),
+    endpoint(
+        'users-reset-username-confirm', 'post',
+        data={'uid': 'x', 'token': 'x', 'new_username': 'me'},
+        anonymous=1, authenticated=1,
+        statuses=(400, 400),
+    ),
+    endpoint(
+        'users-subscribe-batch', 'post', data=new_authors,
+        anonymous=0, authenticated=7,
+        statuses=(401, 200),
+    ),
+    endpoint(
+        'users-subscribe-batch', 'delete', data=subscribed_authors,
+        anonymous=0, authenticated=6,
+        statuses=(401, 200),
+    ),
+    endpoint(
+        'users-subscriptions', anonymous=0, authenticated=3, paginated=True,
+        statuses=(401, 200),
+    ),
+    endpoint(
+        'users-feed', anonymous=0, authenticated=5, paginated=True,
+        statuses=(401, 200),
+    ),
+    endpoint(
+        'users-subscribe', 'post', kwargs=author,
+        anonymous=0, authenticated=6,
+        statuses=(401, 201),
+    ),
+    endpoint(
+        'users-subscribe', 'delete', kwargs=subscribed_author,
+        anonymous=0, authenticated=3,
+        statuses=(401, 204),
+    ),
+    endpoint('recipes-list', anonymous=4, authenticated=5, paginated=True),
+    endpoint(
+        'recipes-list', 'post', data=recipe_payload,
+        anonymous=0, authenticated=12,
+        statuses=(401, 201),
+    ),
+    endpoint(
+        'recipes-detail', kwargs=foreign_recipe,
+        anonymous=3, authenticated=4,
+    ),
+    endpoint(
+        'recipes-detail', 'patch', kwargs=own_recipe, data=recipe_payload,
+        anonymous=0, authenticated=20,
+        statuses=(401, 200),
+    ),
+    endpoint(
+        'recipes-detail', 'delete', kwargs=own_recipe,
+        anonymous=0, authenticated=13,
+        statuses=(401, 204),
+    ),
+    endpoint(
+        'recipes-favorite', 'post', kwargs=foreign_recipe,
+        anonymous=0, authenticated=3,
+        statuses=(401, 201),
+    ),
+    endpoint(
+        'recipes-favorite', 'delete', kwargs=own_recipe,
+        anonymous=0, authenticated=2,
+        statuses=(401, 204),
+    ),
+    endpoint(
+        'recipes-shopping-cart', 'post', kwargs=foreign_recipe,
+        anonymous=0, authenticated=4,
+        statuses=(401, 201),
+    ),
+    endpoint(
+        'recipes-shopping-cart', 'delete', kwargs=own_recipe,
+        anonymous=0, authenticated=4,
+        statuses=(401, 204),
+    ),
+    endpoint(
+        'recipes-favorite-batch', 'post', data=new_recipes,
+        anonymous=0, authenticated=5,
+        statuses=(401, 200),
+    ),
+    endpoint(
+        'recipes-favorite-batch', 'delete', data=favorite_recipes,
+        anonymous=0, authenticated=5,
+        statuses=(401, 200),
+    ),
+    endpoint(
+        'recipes-shopping-cart-batch', 'post', data=new_recipes,
+        anonymous=0, authenticated=6,
+        statuses=(401, 200),
+    ),
+    endpoint(
+        'recipes-shopping-cart-batch', 'delete', data=favorite_recipes,
+        anonymous=0, authenticated=7,
+        statuses=(401, 200),
+    ),
+    endpoint(
+        'recipes-download-shopping-cart', anonymous=0, authenticated=1,
+        statuses=(401, 200),
+    ),
+    endpoint(
+        'recipes-download-shopping-cart', data={'format': 'csv'},
+        anonymous=0, authenticated=1,
+        statuses=(401, 200),
+    ),
+    endpoint(
+        'recipes-download-shopping-cart-job', 'post',
+        anonymous=0, authenticated=1,
+        statuses=(401, 202),
+    ),
+    endpoint(
+        'recipes-download-shopping-cart-result', kwargs=pdf_job,
+        anonymous=0, authenticated=0,
+        statuses=(401, 404),
+    ),
+    endpoint('tags-list', anonymous=1, authenticated=1),
+    endpoint('tags-detail', kwargs=tag, anonymous=1, authenticated=1),
+    endpoint('ingredients-list', anonymous=1, authenticated=1),
+    endpoint(
+        'ingredients-detail', kwargs=ingredient,
+        anonymous=1, authenticated=1,
+    ),
+    endpoint(
+        'login', 'post',
+        data={'email': 'reader@foodgram.ru', 'password': PASSWORD},
+        anonymous=6, authenticated=6,
+    ),
+    endpoint(
+        'logout', 'post', anonymous=0, authenticated=1,
+        statuses=(401, 204),
+    ),
+)
+
+
+@override_settings(
+    MEDIA_ROOT=MEDIA_ROOT,
+    SHOPPING_CART_PDF_ROOT=SHOPPING_CART_PDF_ROOT,
+    PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'],
+)
+class QueryBudgetTest(SeededTestCase):
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+        shutil.rmtree(SHOPPING_CART_PDF_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        super().setUp()
+        # Бюджет проверяется и для ответов с ошибкой: исключение
+        # внутри представления не должно прерывать весь прогон.
+        self.clients = {
+            'anonymous': APIClient(raise_request_exception=False),
+            'authenticated': APIClient(raise_request_exception=False),
+        }
+        self.clients['authenticated'].force_authenticate(
+            self.user
+        )
+
+    def test_every_route_has_budget(self):
+        routes = {url.name for url in router_v1.urls}
+        routes |= {url.name for url in authtoken.urlpatterns}
+        budgeted = {item.route for item in ENDPOINTS}
+        self.assertEqual(
+            routes - budgeted, set(),
+            'Для маршрутов не задан бюджет запросов.'
+        )
+
+    def test_query_and_time_budget(self):
+        for item in ENDPOINTS:
+            for client_name, client in self.clients.items():
+                for limit in PAGE_SIZES if item.paginated else (None,):
+                    with self.subTest(
+                        route=item.route, method=item.method,
+                        client=client_name, limit=limit,
+                    ):
+                        self.check_budget(item, client_name, client, limit)
+
+    def request(self, item, client, limit):
+        kwargs = item.kwargs(self.fixture) if item.kwargs else {}
+        data = item.data
+        if callable(data):
+            data = data(self.fixture)
+        url = reverse(f'api:api:{item.route}', kwargs=kwargs)
+        if limit is not None:
+            url = f'{url}?limit={limit}'
+        return getattr(client, item.method)(url, data=data, format='json')
+
+    def check_budget(self, item, client_name, client, limit):
+        budget = getattr(item, client_name)
+        with transaction.atomic():
+            with CaptureQueriesContext(connection) as queries:
+                started = time.perf_counter()
+                response = self.request(item, client, limit)
+                elapsed = time.perf_counter() - started
+            transaction.set_rollback(True)
+        # Откат не касается объекта пользователя в памяти, а
+        # представления вроде set_password меняют его.
+        self.user.refresh_from_db()
+        executed = len(queries.captured_queries)
+        self.assertEqual(
+            response.status_code, item.statuses[client_name],
+            f'{item.method.upper()} {item.route} ({client_name}, '
+            f'limit={limit}): неожиданный код ответа',
+        )
+        self.assertLessEqual(
+            executed, budget,
+            '{} {} ({}, limit={}): {} SQL-запросов при бюджете {}:\n{}'.format(
+                item.method.upper(), item.route, client_name, limit,
+                executed, budget,
+                '\n'.join(
+                    f'{number}. {query["sql"]}'
+                    for number, query in enumerate(
+                        queries.captured_queries, start=1
+                    )
+                ),
+            )
+        )
+        self.assertLess(
+            elapsed, RESPONSE_TIME,
+            f'{item.method.upper()} {item.route} ({client_name}, '
+            f'limit={limit}): ответ за {elapsed:.3f} с при бюджете '
+            f'{RESPONSE_TIME} с.'
+        )
@@ -0,0 +1,84 @@
+"""Флаги и вложенные данные списка и карточки рецепта."""
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from recipes.models import (FavoriteRecipe, IngredientInRecipe, Recipe,
+                            ShoppingCart, Subscribe)
+
+from .fixtures import SeededTestCase, clear_caches
+
+
+class RecipeReadTest(SeededTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.url = reverse('api:api:recipes-list')
+
+    def expected(self, recipe_id):
+        """Значения, посчитанные отдельными запросами на каждый рецепт."""
+        recipe = Recipe.objects.get(pk=recipe_id)
+        return {
+            'is_favorited': FavoriteRecipe.objects.filter(
+                author=self.user, recipe=recipe
+            ).exists(),
+            'is_in_shopping_cart': ShoppingCart.objects.filter(
+                author=self.user, recipe=recipe
+            ).exists(),
+            'is_subscribed': Subscribe.objects.filter(
+                user=self.user, author=recipe.author
+            ).exists(),
+            'tags': sorted(recipe.tags.values_list('slug', flat=True)),
+            'ingredients': sorted(
+                IngredientInRecipe.objects.filter(recipe=recipe).values_list(
+                    'ingredient_id', 'ingredient__name', 'amount'
+                )
+            ),
+        }
+
+    def actual(self, data):
+        return {
+            'is_favorited': data['is_favorited'],
+            'is_in_shopping_cart': data['is_in_shopping_cart'],
+            'is_subscribed': data['author']['is_subscribed'],
+            'tags': sorted(tag['slug'] for tag in data['tags']),
+            'ingredients': sorted(
+                (item['id'], item['name'], item['amount'])
+                for item in data['ingredients']
+            ),
+        }
+
+    def test_list_matches_database(self):
+        results = self.client.get(self.url, {'limit': 100}).data['results']
+        self.assertEqual(len(results), Recipe.objects.count())
+        for data in results:
+            with self.subTest(recipe=data['id']):
+                self.assertEqual(self.actual(data), self.expected(data['id']))
+        # Среди рецептов есть и отмеченные, и неотмеченные.
+        for flag in ('is_favorited', 'is_in_shopping_cart'):
+            self.assertEqual({data[flag] for data in results}, {True, False})
+
+    def test_detail_matches_list(self):
+        results = self.client.get(self.url, {'limit': 10}).data['results']
+        for data in results:
+            detail = self.client.get(
+                reverse('api:api:recipes-detail', args=[data['id']])
+            ).data
+            self.assertEqual(detail, data)
+
+    def test_anonymous_flags_false(self):
+        self.client.force_authenticate(None)
+        results = self.client.get(self.url, {'limit': 100}).data['results']
+        for data in results:
+            self.assertFalse(data['is_favorited'])
+            self.assertFalse(data['is_in_shopping_cart'])
+            self.assertFalse(data['author']['is_subscribed'])
+
+    def test_queries_independent_of_page_size(self):
+        counts = []
+        for limit in (1, 10, 50):
+            # Иначе часть рецептов пришла бы из кеша фрагментов.
+            clear_caches()
+            with CaptureQueriesContext(connection) as queries:
+                self.client.get(self.url, {'limit': limit})
+            counts.append(len(queries))
+        self.assertEqual(len(set(counts)), 1, counts)
@@ -0,0 +1,63 @@
+"""Поиск рецептов параметром ``search``.
+
+Тесты идут на SQLite, поэтому проверяют запасной вариант поиска:
+фильтрацию, порядок по релевантности и сочетание с другими фильтрами.
+"""
+from django.test import override_settings
+from django.urls import reverse
+from recipes.models import Recipe
+
+from .fixtures import SeededTestCase
+
+
+@override_settings(
+    PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'],
+)
+class RecipeSearchTest(SeededTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.text_match = Recipe.objects.create(
+            author=cls.fixture['authors'][0],
+            name='Окрошка',
+            text='Летний суп на квасе.',
+            cooking_time=15,
+            image='recipes/seed.png',
+        )
+        cls.name_match = Recipe.objects.create(
+            author=cls.fixture['authors'][1],
+            name='Домашний квас',
+            text='Напиток из ржаного хлеба.',
+            cooking_time=30,
+            image='recipes/seed.png',
+        )
+        cls.name_match.tags.set(cls.fixture['tags'][:1])
+
+    def search(self, **params):
+        response = self.client.get(
+            reverse('api:api:recipes-list'), {'limit': 100, **params}
+        )
+        self.assertEqual(response.status_code, 200)
+        return [recipe['id'] for recipe in response.data['results']]
+
+    def test_name_match_ranked_first(self):
+        self.assertEqual(
+            self.search(search='квас'),
+            [self.name_match.id, self.text_match.id],
+        )
+
+    def test_combines_with_filters(self):
+        self.assertEqual(
+            self.search(search='квас', tags=self.fixture['tags'][0].slug),
+            [self.name_match.id],
+        )
+        self.assertEqual(
+            self.search(search='Свой', is_favorited=1),
+            [self.fixture['own_recipe'].id],
+        )
+
+    def test_blank_query_is_ignored(self):
+        self.assertEqual(
+            len(self.search(search='  ')), Recipe.objects.count()
+        )
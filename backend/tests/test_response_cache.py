@@ -0,0 +1,93 @@
+"""Кеш ответов списка рецептов для анонимных посетителей."""
+from unittest import mock
+
+from django.urls import reverse
+from recipes.models import Recipe
+from rest_framework.test import APIClient
+from users.models import User
+
+from .fixtures import SeededTestCase
+
+
+class RecipeListCacheTest(SeededTestCase):
+
+    authenticated = False
+
+    def setUp(self):
+        super().setUp()
+        self.url = reverse('api:api:recipes-list')
+
+    def test_served_from_cache(self):
+        first = self.client.get(self.url, {'limit': 5, 'tags': 'tag1'})
+        with self.assertNumQueries(0):
+            second = self.client.get(
+                f'{self.url}?tags=tag1&limit=5'
+            )
+        self.assertEqual(second.status_code, 200)
+        self.assertEqual(second.content, first.content)
+
+    def test_invalidated_on_change(self):
+        self.client.get(self.url, {'limit': 5})
+        with mock.patch('recipes.images.schedule'), \
+                self.captureOnCommitCallbacks(execute=True):
+            recipe = Recipe.objects.create(
+                author=self.fixture['authors'][0], name='Свежий рецепт',
+                text='Описание.', cooking_time=5, image='recipes/seed.png',
+            )
+        response = self.client.get(self.url, {'limit': 5})
+        self.assertEqual(response.data['results'][0]['id'], recipe.id)
+
+    def test_invalidated_by_favorite(self):
+        recipe = self.fixture['recipes'][1]
+        self.client.get(self.url, {'limit': 100})
+        author = APIClient()
+        author.force_authenticate(self.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            author.post(reverse('api:api:recipes-favorite', args=[recipe.pk]))
+        response = self.client.get(self.url, {'limit': 100})
+        counts = {
+            item['id']: item['favorites_count']
+            for item in response.data['results']
+        }
+        self.assertEqual(
+            counts[recipe.pk],
+            Recipe.objects.get(pk=recipe.pk).favorites_count,
+        )
+        self.assertEqual(counts[recipe.pk], 1)
+
+    def test_kept_on_signup_and_password_change(self):
+        self.client.get(self.url, {'limit': 5})
+        with self.captureOnCommitCallbacks(execute=True):
+            user = User.objects.create_user(
+                username='newcomer', email='newcomer@foodgram.ru',
+                password='Sup3r-Secret-Pass', first_name='Новый',
+                last_name='Пользователь',
+            )
+            user.set_password('An0ther-Secret-Pass')
+            user.save()
+            author = self.fixture['authors'][0]
+            author.refresh_from_db()
+            author.save()
+        with self.assertNumQueries(0):
+            self.client.get(self.url, {'limit': 5})
+
+    def test_invalidated_by_author_rename(self):
+        self.client.get(self.url, {'limit': 5})
+        author = Recipe.objects.latest('pub_date').author
+        author.first_name = 'Переименованный'
+        with self.captureOnCommitCallbacks(execute=True):
+            author.save(update_fields=['first_name'])
+        response = self.client.get(self.url, {'limit': 5})
+        self.assertIn('Переименованный', {
+            recipe['author']['first_name']
+            for recipe in response.data['results']
+        })
+
+    def test_authenticated_not_cached(self):
+        self.client.get(self.url, {'limit': 5})
+        self.client.force_authenticate(self.user)
+        response = self.client.get(self.url, {'limit': 5})
+        self.assertIn('is_favorited', response.data['results'][0])
+        self.assertTrue(any(
+            recipe['is_favorited'] for recipe in response.data['results']
+        ))
@@ -0,0 +1,108 @@
+"""Списки покупок, поддерживаемые приращениями."""
+from io import StringIO
+from unittest import mock
+
+from django.core.management import CommandError, call_command
+from django.urls import reverse
+from recipes import shopping_list
+from recipes.management.commands import rebuild_shopping_lists
+from recipes.models import ShoppingCart, ShoppingListItem
+
+from .fixtures import SeededTestCase
+
+
+class ShoppingListTest(SeededTestCase):
+
+    def assertListsConsistent(self):
+        self.assertEqual(
+            rebuild_shopping_lists.stored_items(),
+            rebuild_shopping_lists.expected_items(),
+        )
+
+    def test_cart_changes(self):
+        self.assertListsConsistent()
+        recipes = self.fixture['recipes']
+        ShoppingCart.objects.create(author=self.user, recipe=recipes[1])
+        self.assertListsConsistent()
+        self.client.post(
+            reverse('api:api:recipes-shopping-cart', args=[recipes[2].pk])
+        )
+        self.client.post(
+            reverse('api:api:recipes-shopping-cart-batch'),
+            {'ids': [recipes[4].pk, recipes[5].pk]}, format='json',
+        )
+        self.assertListsConsistent()
+        self.client.delete(
+            reverse('api:api:recipes-shopping-cart', args=[recipes[1].pk])
+        )
+        self.client.delete(
+            reverse('api:api:recipes-shopping-cart-batch'),
+            {'ids': [recipes[4].pk]}, format='json',
+        )
+        ShoppingCart.objects.filter(
+            author=self.user, recipe=recipes[5]
+        ).delete()
+        self.assertListsConsistent()
+
+    def test_recipe_ingredients_change(self):
+        recipe = self.fixture['own_recipe']
+        ShoppingCart.objects.create(
+            author=self.fixture['authors'][0], recipe=recipe
+        )
+        response = self.client.patch(
+            reverse('api:api:recipes-detail', args=[recipe.pk]),
+            {
+                'name': recipe.name,
+                'text': recipe.text,
+                'cooking_time': 5,
+                'tags': [tag.id for tag in self.fixture['tags']],
+                'ingredients': [
+                    {'id': ingredient.id, 'amount': 7}
+                    for ingredient in self.fixture['ingredients'][10:20]
+                ],
+            },
+            format='json',
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertListsConsistent()
+
+    def test_recipe_rows_locked(self):
+        recipe = self.fixture['recipes'][1]
+        with mock.patch.object(
+            shopping_list, 'lock', wraps=shopping_list.lock
+        ) as lock:
+            self.client.post(
+                reverse('api:api:recipes-shopping-cart', args=[recipe.pk])
+            )
+            self.client.delete(
+                reverse('api:api:recipes-shopping-cart', args=[recipe.pk])
+            )
+            with shopping_list.editing([recipe.pk]):
+                pass
+        self.assertEqual(lock.call_args_list, [mock.call([recipe.pk])] * 4)
+
+    def test_cascade_delete(self):
+        self.fixture['recipes'][0].delete()
+        self.assertListsConsistent()
+        self.fixture['ingredients'][0].delete()
+        self.assertListsConsistent()
+        self.user.delete()
+        self.assertListsConsistent()
+
+    def test_download_reads_list(self):
+        with self.assertNumQueries(1):
+            response = self.client.get(
+                reverse('api:api:recipes-download-shopping-cart')
+            )
+            b''.join(response.streaming_content)
+        self.assertEqual(response.status_code, 200)
+
+    def test_rebuild_command(self):
+        call_command('rebuild_shopping_lists', '--check', stdout=StringIO())
+        ShoppingListItem.objects.filter(user=self.user).update(amount=1)
+        with self.assertRaises(CommandError):
+            call_command(
+                'rebuild_shopping_lists', '--check', stdout=StringIO()
+            )
+        call_command('rebuild_shopping_lists', stdout=StringIO())
+        self.assertListsConsistent()
@@ -0,0 +1,38 @@
+"""Страница подписок с превью рецептов авторов."""
+from django.urls import reverse
+
+from .fixtures import SeededTestCase
+
+
+class SubscriptionsTest(SeededTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.url = reverse('api:api:users-subscriptions')
+
+    def test_recipe_previews(self):
+        for limit in (1, 2, 100):
+            with self.subTest(limit=limit):
+                response = self.client.get(
+                    self.url, {'limit': 10, 'recipes_limit': limit}
+                )
+                self.assertEqual(response.status_code, 200)
+                results = response.data['results']
+                self.assertEqual(len(results), 3)
+                for item in results:
+                    author = next(
+                        author for author in self.fixture['authors']
+                        if author.id == item['id']
+                    )
+                    expected = [
+                        recipe.id for recipe in author.recipe.order_by(
+                            '-pub_date', '-id'
+                        )[:limit]
+                    ]
+                    self.assertEqual(
+                        [recipe['id'] for recipe in item['recipes']],
+                        expected,
+                    )
+                    self.assertEqual(
+                        item['recipes_count'], author.recipe.count()
+                    )
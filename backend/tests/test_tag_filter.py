@@ -0,0 +1,90 @@
+"""Фильтр рецептов по тегам."""
+from unittest import mock
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from recipes.models import Recipe, Tag
+
+from .fixtures import SeededTestCase
+
+
+class TagFilterTest(SeededTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.url = reverse('api:api:recipes-list')
+
+    def test_several_tags_without_duplicates(self):
+        slugs = ['tag0', 'tag1', 'tag2']
+        params = {'tags': slugs, 'limit': 100}
+        self.client.get(self.url, params)
+        with self.assertNumQueries(2):
+            response = self.client.get(self.url, params)
+        ids = [recipe['id'] for recipe in response.data['results']]
+        self.assertEqual(len(ids), len(set(ids)))
+        self.assertEqual(
+            set(ids),
+            set(Recipe.objects.filter(
+                tags__slug__in=slugs
+            ).values_list('id', flat=True)),
+        )
+        self.assertEqual(response.data['count'], len(ids))
+
+    def test_unknown_tag_ignored(self):
+        response = self.client.get(
+            self.url, {'tags': ['missing', 'tag0'], 'limit': 100}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response.data['count'],
+            Recipe.objects.filter(tags__slug='tag0').count(),
+        )
+        response = self.client.get(self.url, {'tags': 'missing', 'limit': 1})
+        self.assertEqual(response.data['count'], 0)
+
+    def test_unknown_tag_does_not_reload_tags(self):
+        self.client.get(self.url, {'tags': 'tag0'})
+        with CaptureQueriesContext(connection) as queries:
+            for _ in range(3):
+                self.client.get(self.url, {'tags': 'missing'})
+        tags = 'FROM ' + connection.ops.quote_name(Tag._meta.db_table)
+        self.assertFalse([
+            query for query in queries.captured_queries
+            if tags in query['sql']
+        ])
+
+    def test_empty_value_not_filtered(self):
+        response = self.client.get(self.url, {'tags': '', 'limit': 1})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['count'], Recipe.objects.count())
+
+    @mock.patch('api.v1.tag_slugs.MISSING_RELOAD_INTERVAL', -1)
+    def test_tag_from_other_process_recognized(self):
+        self.client.get(self.url, {'tags': 'tag0'})
+        # bulk_create не шлёт сигналов, как и запись из другого процесса.
+        Tag.objects.bulk_create([
+            Tag(name='Чужой', slug='foreign', color='#ABCDEF')
+        ])
+        tag = Tag.objects.get(slug='foreign')
+        Recipe.tags.through.objects.create(
+            recipe=self.fixture['recipes'][0], tag=tag
+        )
+        response = self.client.get(
+            self.url, {'tags': 'foreign', 'limit': 10}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [recipe['id'] for recipe in response.data['results']],
+            [self.fixture['recipes'][0].id],
+        )
+
+    def test_new_tag_recognized(self):
+        self.client.get(self.url, {'tags': 'tag0'})
+        tag = Tag.objects.create(name='Новый', slug='fresh', color='#FFFFFF')
+        self.fixture['recipes'][0].tags.add(tag)
+        response = self.client.get(self.url, {'tags': 'fresh', 'limit': 10})
+        self.assertEqual(
+            [recipe['id'] for recipe in response.data['results']],
+            [self.fixture['recipes'][0].id],
+        )
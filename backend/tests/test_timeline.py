@@ -0,0 +1,79 @@
+"""Лента подписок, заполняемая при записи."""
+from unittest import mock
+
+from django.urls import reverse
+from recipes.models import Recipe, Subscribe, TimelineEntry
+from recipes.timeline import fan_out
+from users.models import User
+
+from .fixtures import SeededTestCase
+
+
+class TimelineTest(SeededTestCase):
+
+    def expected(self):
+        return list(Recipe.objects.filter(
+            author__subscribed__user=self.user
+        ).order_by('-pub_date', '-id').values_list('id', flat=True))
+
+    def feed(self):
+        ids = []
+        response = self.client.get(
+            reverse('api:api:users-feed'), {'limit': 7}
+        )
+        while True:
+            self.assertEqual(response.status_code, 200)
+            ids.extend(recipe['id'] for recipe in response.data['results'])
+            if response.data['next'] is None:
+                return ids
+            response = self.client.get(response.data['next'])
+
+    def test_backfilled_on_subscribe(self):
+        self.assertEqual(self.feed(), self.expected())
+        Subscribe.objects.create(
+            user=self.user, author=self.fixture['authors'][4]
+        )
+        self.assertEqual(self.feed(), self.expected())
+
+    def test_trimmed_on_unsubscribe(self):
+        Subscribe.objects.filter(author=self.fixture['authors'][0]).delete()
+        self.assertEqual(self.feed(), self.expected())
+        self.assertFalse(TimelineEntry.objects.filter(
+            user=self.user, author=self.fixture['authors'][0]
+        ).exists())
+
+    def test_fan_out_on_create(self):
+        author = self.fixture['authors'][0]
+        Subscribe.objects.create(
+            user=self.fixture['authors'][1], author=author
+        )
+        # Картинки обрабатываются в отдельном потоке, здесь не нужны.
+        with mock.patch('recipes.images.schedule'), \
+                self.captureOnCommitCallbacks(execute=True):
+            recipe = Recipe.objects.create(
+                author=author, name='Новый рецепт', text='Описание.',
+                cooking_time=5, image='recipes/seed.png',
+            )
+        self.assertEqual(self.feed()[0], recipe.id)
+        self.assertEqual(
+            set(recipe.timeline_entries.values_list('user', flat=True)),
+            {self.user.id, self.fixture['authors'][1].id},
+        )
+
+    def test_fan_out_in_batches(self):
+        recipe = self.fixture['recipes'][0]
+        for number in range(5):
+            Subscribe.objects.create(
+                user=User.objects.create(
+                    username=f'reader{number}',
+                    email=f'reader{number}@foodgram.ru',
+                ),
+                author=recipe.author,
+            )
+        TimelineEntry.objects.filter(recipe=recipe).delete()
+        # Рецепт, подписчики и по одному INSERT на пачку из двух строк.
+        with mock.patch('recipes.timeline.FANOUT_BATCH_SIZE', 2):
+            with self.assertNumQueries(5):
+                fan_out(recipe.id)
+        self.assertEqual(recipe.timeline_entries.count(), 6)
+        self.assertEqual(self.feed(), self.expected())
@@ -10,6 +10,8 @@ class UserAdmin(admin.ModelAdmin):
         'first_name',
         'last_name',
         'email',
+        'recipes_count',
+        'subscribers_count',
     )
     search_fields = ('username',)
     list_filter = ('username',)
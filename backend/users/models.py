@@ -1,5 +1,5 @@
 from django.contrib.auth.models import AbstractUser
-from django.db.models import CharField, EmailField
+from django.db.models import CharField, EmailField, PositiveIntegerField
 
 USER = 'user'
 ADMIN = 'admin'
@@ -23,6 +23,16 @@ class User(AbstractUser):
         max_length=254,
         unique=True,
     )
+    recipes_count = PositiveIntegerField(
+        'Количество рецептов',
+        default=0,
+        editable=False
+    )
+    subscribers_count = PositiveIntegerField(
+        'Количество подписчиков',
+        default=0,
+        editable=False
+    )
 
     @property
     def is_user(self):